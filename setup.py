@@ -31,7 +31,7 @@ setup(
         "click",
         "pyyaml",
         "boto3",
-        "backoff",
     ],
+    extras_require={"orjson": ["orjson"]},
     entry_points={"console_scripts": ["solgate=solgate.cli:cli"]},
 )
@@ -52,8 +52,31 @@ def cli(ctx, config_filename, config_folder):  # noqa: D301
     default=False,
     help="Do not execute file transfers, just list what would happen.",
 )
+@click.option(
+    "--checkpoint-file",
+    type=click.Path(exists=False),
+    help=(
+        "Record transferred objects to this file. "
+        "Objects already recorded in it are skipped unless they were modified since."
+    ),
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=8,
+    show_default=True,
+    help="Number of objects transferred concurrently.",
+)
 @click.pass_context
-def _send(ctx, key: str = None, listing_file: str = None, dry_run: bool = False):
+def _send(
+    ctx,
+    key: str = None,
+    listing_file: str = None,
+    dry_run: bool = False,
+    checkpoint_file: str = None,
+    workers: int = 8,
+):
     """Sync S3 objects.
 
     KEY points to a S3 Object within the source base path, that is meant to be transferred.
@@ -66,7 +89,7 @@ def _send(ctx, key: str = None, listing_file: str = None, dry_run: bool = False)
         files_to_transfer, count = [], 0
 
     try:
-        send(files_to_transfer, ctx.obj["config"], count, dry_run)
+        send(files_to_transfer, ctx.obj["config"], count, dry_run, checkpoint_file, workers)
     except FileNotFoundError as e:
         logger.error(e, exc_info=True)
         raise NoFilesToSyncError(*e.args)
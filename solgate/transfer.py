@@ -1,47 +1,101 @@
 """Transfer files."""
 
+import os
+import random
 import shutil
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime, timezone
 from itertools import tee
-from typing import Any, Dict, Iterable, Iterator, List
+from pathlib import Path
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional, Tuple
 
-import backoff
+from .utils import S3File, S3FileSystem, deserialize, format_key, logger, parse_key, serialize
+from .utils.s3 import MULTIPART_THRESHOLD
 
-from .utils import S3File, S3FileSystem, key_formatter, logger
+COPY_BUFFER_SIZE = 1 << 20
 
+_MAX_RETRIES = 10
 
-def copy(files: List[S3File]) -> None:
+
+def _stream_copy(source: S3File, destination: S3File, **kwargs: Any) -> None:
+    """Stream an object between different clients.
+
+    Objects larger than MULTIPART_THRESHOLD are uploaded in parallel multipart chunks.
+
+    Args:
+        source (S3File): Object to read from.
+        destination (S3File): Object to write to.
+        **kwargs: Flags passed to the source client when opening the object.
+
+    """
+    with source.client.open(source.key, "rb", **kwargs) as i:
+        if int(source.info["size"]) > MULTIPART_THRESHOLD:
+            destination.client.upload_fileobj(i, destination.key)
+            return
+
+        with destination.client.open(destination.key, "wb") as o:
+            shutil.copyfileobj(i, o, COPY_BUFFER_SIZE)
+            o.flush()
+
+
+def _copy_pair(source: S3File, a: S3File, b: S3File) -> None:
+    """Copy an object to the next destination.
+
+    Args:
+        source (S3File): Original object in the source bucket.
+        a (S3File): Previously written copy of the object (or the source itself).
+        b (S3File): Destination to write.
+
+    """
+    log_args = dict(source=dict(client=a.client, key=a.key), destination=dict(client=b.client, key=b.key))
+    if a.client == b.client:
+        logger.info("Copying within the same clients", log_args)
+        a.client.copy(a.client.bucket, a.key, b.client.bucket, b.key, b.client.path)
+        return
+
+    logger.info("Copying to a different client", log_args)
+    if a.client.flags == b.client.flags:
+        logger.info("Matching flags, files can be copied one to one.", log_args)
+        _stream_copy(a, b)
+        return
+
+    if source.client == b.client:
+        logger.info("Flags don't match, copying from source within the same clients", log_args)
+        source.client.copy(source.client.bucket, source.key, b.client.bucket, b.key, b.client.path)
+        return
+
+    logger.info("Flags don't match, copying from source", log_args)
+    _stream_copy(source, b, **b.client.flags)
+
+
+def copy(files: List[S3File], created: Optional[List[S3File]] = None) -> None:
     """Clever copy of S3 objects.
 
-    If both buckets are accessible via the same client, use S3 copy command.
+    If both buckets are accessible via the same client, use S3 copy command. This also applies when the object
+    has to be copied from the source instead of the previous destination, because the flags differ.
     Otherwise, if the clients differs, use regular copy file func.
 
     Args:
         client_key_pairs (Iterable[ClientKeyPair]): List of clients and paths to
             where to copy to.
+        created (List[S3File], optional): Destinations which didn't exist before the first write are appended to
+            this list once written. The list is meant to be shared by all attempts to transfer the same object.
 
     """
     file_a, file_b = tee(files)
     next(file_b, None)
 
     for a, b in zip(file_a, file_b):
-        log_args = dict(source=dict(client=a.client, key=a.key), destination=dict(client=b.client, key=b.key))
-        if a.client == b.client:
-            logger.info("Copying within the same clients", log_args)
-            a.client.copy(a.client.bucket, a.key, b.client.bucket, b.key)
-            continue
-
-        logger.info("Copying to a different client", log_args)
-        if a.client.flags == b.client.flags:
-            logger.info("Matching flags, files can be copied one to one.", log_args)
-            with a.client.open(a.key, "rb") as i, b.client.open(b.key, "wb") as o:
-                shutil.copyfileobj(i, o)
-                o.flush()
-            continue
-
-        logger.info("Flags don't match, copying from source", log_args)
-        with files[0].client.open(files[0].key, "rb", **b.client.flags) as i, b.client.open(b.key, "wb") as o:
-            shutil.copyfileobj(i, o)
-            o.flush()
+        # Objects created by a previous attempt exist already, but they are still owned by this transfer
+        new = (
+            created is not None
+            and not any(f.client is b.client and f.key == b.key for f in created)
+            and not b.client.exists(b.key)
+        )
+        _copy_pair(files[0], a, b)
+        if new:
+            created.append(b)  # type: ignore
 
 
 def calc_s3_files(source_path: str, clients: List[S3FileSystem]) -> Iterator[S3File]:
@@ -61,13 +115,17 @@ def calc_s3_files(source_path: str, clients: List[S3FileSystem]) -> Iterator[S3F
         yield from [S3File(c, source_path) for c in clients]
     else:
         yield S3File(clients[0], source_path)
+        # The source key is parsed only once for all destinations sharing the same unpack flag
+        parsed: Dict[bool, Dict[str, str]] = {}
         for c in clients[1:]:
             if not c.formatter:
                 yield S3File(c, source_path)
                 continue
 
-            destination_path = key_formatter(source_path, clients[0].formatter, c.formatter, **c.flags)
-            yield S3File(c, destination_path)
+            unpack = bool(c.flags.get("unpack"))
+            if unpack not in parsed:
+                parsed[unpack] = parse_key(source_path, clients[0].formatter, unpack)
+            yield S3File(c, format_key(parsed[unpack], c.formatter))
 
 
 def verify(files: Iterable[S3File], dry_run: bool = False) -> bool:
@@ -96,9 +154,50 @@ class TransferFailed(Exception):
     pass
 
 
-@backoff.on_exception(backoff.expo, TransferFailed, max_tries=10, logger=logger)
 def _transfer_single_file(
-    source_path: str, clients: List[S3FileSystem], idx: int, count: int, dry_run: bool = False
+    source_path: str,
+    clients: List[S3FileSystem],
+    idx: int,
+    count: int,
+    dry_run: bool = False,
+    created: Optional[List[S3File]] = None,
+) -> None:
+    """Transfer single object between S3s, retry on failure.
+
+    Retries are spaced by an exponential backoff with full jitter, up to _MAX_RETRIES attempts in total.
+
+    Args:
+        source_path (str): Key to the object within the source S3 bucket.
+        clients (List[S3FileSystem]): S3 clients to sync between.
+        dry_run (bool, optional): Do not execute file transfers, just list what would happen.
+        created (List[S3File], optional): Newly created destinations are appended to this list.
+
+    Raises:
+        TransferError: When the last attempt fails
+
+    Returns:
+        None: Returns if success
+
+    """
+    for attempt in range(_MAX_RETRIES):
+        try:
+            return _attempt_transfer_single_file(source_path, clients, idx, count, dry_run, created)
+        except TransferFailed:
+            if attempt + 1 >= _MAX_RETRIES:
+                logger.error("Giving up", dict(key=source_path, idx=idx, count=count, tries=attempt + 1))
+                raise
+            wait = random.uniform(0, 2 ** attempt)
+            logger.info("Backing off", dict(key=source_path, idx=idx, count=count, tries=attempt + 1, wait=wait))
+            time.sleep(wait)
+
+
+def _attempt_transfer_single_file(
+    source_path: str,
+    clients: List[S3FileSystem],
+    idx: int,
+    count: int,
+    dry_run: bool = False,
+    created: Optional[List[S3File]] = None,
 ) -> None:
     """Transfer single object between S3s.
 
@@ -106,6 +205,7 @@ def _transfer_single_file(
         source_path (str): Key to the object within the source S3 bucket.
         clients (List[S3FileSystem]): S3 clients to sync between.
         dry_run (bool, optional): Do not execute file transfers, just list what would happen.
+        created (List[S3File], optional): Newly created destinations are appended to this list.
 
     Raises:
         TransferError: In case of transfer or verification failure
@@ -126,7 +226,7 @@ def _transfer_single_file(
             ),
         )
         if not dry_run:
-            copy(files)
+            copy(files, created)
 
     except:  # noqa: E722
         logger.error("Failed to transfer a file", dict(idx=idx, count=count), exc_info=True)
@@ -140,13 +240,200 @@ def _transfer_single_file(
     logger.info("Verified", dict(files=files, idx=idx, count=count))
 
 
-def send(files_to_transfer: List[Dict[str, Any]], config: Dict[str, Any], count: int, dry_run: bool = False) -> bool:
+def _read_checkpoint(filename: str) -> Dict[str, str]:
+    """Load already transferred objects from a checkpoint file.
+
+    Args:
+        filename (str): Checkpoint file name or path.
+
+    Returns:
+        Dict[str, str]: Source object keys mapped to their ETag at the time of the transfer.
+
+    """
+    checkpoint: Dict[str, str] = {}
+    if not Path(filename).is_file():
+        return checkpoint
+
+    records, count = deserialize(filename, skip_invalid=True)
+    valid = 0
+    for record in records:
+        if isinstance(record, dict) and "key" in record and "etag" in record:
+            checkpoint[record["key"]] = record["etag"]
+            valid += 1
+
+    if valid < count:
+        # A previous run could have been interrupted while writing a record
+        logger.warning("Ignoring invalid checkpoint records", dict(checkpoint_file=filename, count=count - valid))
+
+    return checkpoint
+
+
+def _get_etag(client: S3FileSystem, key: str) -> Optional[str]:
+    """Fetch current ETag of an object, if available.
+
+    Args:
+        client (S3FileSystem): S3 client.
+        key (str): Object key.
+
+    Returns:
+        Optional[str]: Object ETag or None, if it can't be determined.
+
+    """
+    try:
+        return client.info(key)["etag"]
+    except (OSError, KeyError):
+        logger.warning("Unable to fetch object ETag", dict(client=client, key=key), exc_info=True)
+        return None
+
+
+def _write_checkpoint(filename: str, key: str, etag: str) -> None:
+    """Record a transferred object in a checkpoint file.
+
+    Args:
+        filename (str): Checkpoint file name or path.
+        key (str): Source object key.
+        etag (str): Source object ETag.
+
+    """
+    with open(filename, "ab+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size:
+            f.seek(size - 1)
+            if f.read(1) != b"\n":
+                # Don't append to an incomplete record left behind by an interrupted run
+                f.write(b"\n")
+    serialize(dict(key=key, etag=etag, timestamp=datetime.now(timezone.utc)), filename)
+
+
+def _process_file(
+    source_file: Dict[str, Any],
+    clients: List[S3FileSystem],
+    idx: int,
+    count: int,
+    dry_run: bool,
+    checkpoint: Optional[Dict[str, str]],
+    created: List[S3File],
+) -> Optional[Tuple[str, str]]:
+    """Transfer a single listed object unless it's already recorded in the checkpoint.
+
+    Args:
+        source_file (Dict[str, Any]): Listed object, expected to contain a "key".
+        clients (List[S3FileSystem]): S3 clients to sync between.
+        idx (int): Index of the object within the listing.
+        count (int): Total number of objects in the listing.
+        dry_run (bool): Do not execute file transfers, just list what would happen.
+        checkpoint (Optional[Dict[str, str]]): Already transferred objects, None if checkpointing is disabled.
+        created (List[S3File]): Newly created destinations are appended to this list.
+
+    Raises:
+        KeyError: When the listed object doesn't contain a key.
+        TransferFailed: When the object fails to transfer.
+
+    Returns:
+        Optional[Tuple[str, str]]: Key and ETag of the transferred object, if it should be checkpointed.
+
+    """
+    key = source_file["key"]
+    etag = _get_etag(clients[0], key) if checkpoint is not None else None
+    if etag and checkpoint.get(key) == etag:  # type: ignore
+        logger.info("File already transferred, skipping", dict(file=source_file, idx=idx, count=count))
+        return None
+
+    _transfer_single_file(key, clients, idx, count, dry_run, created)
+
+    if etag and not dry_run:
+        return key, etag
+    return None
+
+
+def _destination_objects(source_file: Dict[str, Any], clients: List[S3FileSystem]) -> List[Tuple[str, str, str]]:
+    """Identify objects written by a transfer of the listed object.
+
+    Args:
+        source_file (Dict[str, Any]): Listed object, expected to contain a "key".
+        clients (List[S3FileSystem]): S3 clients to sync between.
+
+    Returns:
+        List[Tuple[str, str, str]]: Endpoint, bucket and key of each destination object. Empty if the destinations
+            can't be determined, the transfer itself reports the error then.
+
+    """
+    try:
+        destinations = list(calc_s3_files(source_file["key"], clients))[1:]
+    except (KeyError, TypeError, ValueError):
+        return []
+    return [(f.client.endpoint_url, f.client.bucket, f.client.bucket_key(f.key)) for f in destinations]
+
+
+def _process_file_after(previous: Collection[Future], *args: Any) -> Optional[Tuple[str, str]]:
+    """Wait for previously submitted transfers writing the same destinations, then process the file.
+
+    Args:
+        previous (Collection[Future]): Transfers which have to finish first.
+        *args: Arguments passed to _process_file.
+
+    Returns:
+        Optional[Tuple[str, str]]: Key and ETag of the transferred object, if it should be checkpointed.
+
+    """
+    wait(previous)
+    return _process_file(*args)
+
+
+def _rollback(
+    source: S3FileSystem,
+    failed_transfers: List[Tuple[str, List[S3File]]],
+    keep: Collection[Tuple[str, str, str]] = (),
+) -> None:
+    """Delete destinations created by failed transfers, so no partial results are left behind.
+
+    Only objects which didn't exist before the failed transfer are deleted, objects written by a successful transfer
+    within the same run are kept as well. Objects are deleted in bulk, grouped by the bucket and credentials used to
+    access it. The source object is never deleted, even if a destination points to it.
+
+    Args:
+        source (S3FileSystem): Source S3 client.
+        failed_transfers (List[Tuple[str, List[S3File]]]): Source keys paired with their created destinations.
+        keep (Collection[Tuple[str, str, str]], optional): Endpoint, bucket and key of objects which must not be
+            deleted.
+
+    """
+    batches: Dict[Tuple[str, ...], Tuple[S3FileSystem, List[str]]] = {}
+    for source_key, destinations in failed_transfers:
+        source_object = (source.endpoint_url, source.bucket, source.bucket_key(source_key))
+        for f in destinations:
+            c = f.client
+            destination_object = (c.endpoint_url, c.bucket, c.bucket_key(f.key))
+            if destination_object == source_object or destination_object in keep:
+                continue
+            group = (c.endpoint_url, c.aws_access_key_id, c.aws_secret_access_key, c.bucket)
+            batches.setdefault(group, (c, []))[1].append(c.bucket_key(f.key))
+
+    for client, keys in batches.values():
+        logger.info("Rolling back failed transfers", dict(client=client, keys=keys))
+        try:
+            client.delete_objects(keys)
+        except:  # noqa: E722
+            logger.error("Failed to roll back", dict(client=client, keys=keys), exc_info=True)
+
+
+def send(
+    files_to_transfer: List[Dict[str, Any]],
+    config: Dict[str, Any],
+    count: int,
+    dry_run: bool = False,
+    checkpoint_file: str = None,
+    max_workers: int = 8,
+) -> bool:
     """Transfer recent data between S3s, multiple files.
 
     Args:
         filename (str): Json file that contains list of S3 objects to be transferred.
         config_file (str, optional): Path to configuration file. Defaults to None.
         dry_run (bool, optional): Do not execute file transfers, just list what would happen.
+        checkpoint_file (str, optional): Record transferred objects to this file and skip objects which were
+            already transferred and haven't changed since.
+        max_workers (int, optional): Number of objects transferred concurrently. Defaults to 8.
 
     Returns:
         bool: True if success
@@ -165,17 +452,48 @@ def send(files_to_transfer: List[Dict[str, Any]], config: Dict[str, Any], count:
     if not files_to_transfer:
         raise FileNotFoundError("No files to transfer")
 
+    checkpoint = _read_checkpoint(checkpoint_file) if checkpoint_file else None
+
     failed = []
+    rollback = []
+    written = set()
     count = count or len(files_to_transfer)
-    for idx, source_file in enumerate(files_to_transfer):
-        try:
-            _transfer_single_file(source_file["key"], clients, idx, count, dry_run)
-        except TransferFailed:
-            logger.error("Max retries reached", dict(file=source_file), exc_info=True)
-            failed.append(source_file)
-        except KeyError:
-            logger.error("Unable to parse file key", dict(file=source_file), exc_info=True)
-            failed.append(source_file)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        # Objects sharing a destination (e.g. a "latest" copy) are written in the listing order, one at a time.
+        # Workers pick up tasks in the submission order, so a waiting task never blocks the ones it waits for.
+        last_writer: Dict[Tuple[str, str, str], Future] = {}
+        for idx, source_file in enumerate(files_to_transfer):
+            created: List[S3File] = []
+            destinations = _destination_objects(source_file, clients)
+            previous = {last_writer[d] for d in destinations if d in last_writer}
+            future = executor.submit(
+                _process_file_after, previous, source_file, clients, idx, count, dry_run, checkpoint, created
+            )
+            last_writer.update(dict.fromkeys(destinations, future))
+            futures[future] = (source_file, destinations, created)
+
+        # Results are handled in the main thread only, so the checkpoint file and the failed list are not shared
+        for future in as_completed(futures):
+            source_file, destinations, created = futures[future]
+            try:
+                transferred = future.result()
+            except TransferFailed:
+                logger.error("Max retries reached", dict(file=source_file), exc_info=True)
+                failed.append(source_file)
+                rollback.append((source_file["key"], created))
+                continue
+            except KeyError:
+                logger.error("Unable to parse file key", dict(file=source_file), exc_info=True)
+                failed.append(source_file)
+                continue
+
+            written.update(destinations)
+            if transferred:
+                _write_checkpoint(checkpoint_file, *transferred)  # type: ignore
+
+    if rollback:
+        _rollback(clients[0], rollback, written)
 
     if failed:
         raise IOError("Some files failed to be transferred", dict(failed_files=failed))
@@ -2,7 +2,7 @@
 
 # flake8: noqa
 
-from .io import deserialize, key_formatter, read_general_config, serialize, initialize_file
+from .io import deserialize, format_key, key_formatter, parse_key, read_general_config, serialize, initialize_file
 from .logging import logger
 from .s3 import S3File, S3FileSystem, S3ConfigSelector
 from .exceptions import EXIT_CODES, NoFilesToSyncError, FilesFailedToSyncError
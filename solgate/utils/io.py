@@ -1,26 +1,69 @@
 """IO helpers."""
 
 import json
+import os
 import re
+import stat
+from collections import ChainMap, OrderedDict, abc
 from pathlib import Path
 
 from yaml import load as yaml_load
 
 try:
-    from yaml import CLoader as Loader
+    from yaml import CSafeLoader as Loader
 except ImportError:  # pragma nocover
-    from yaml import Loader  # type: ignore
+    from yaml import SafeLoader as Loader  # type: ignore
+
+try:
+    import orjson
+except ImportError:  # pragma nocover
+    orjson = None  # type: ignore
 
 from dataclasses import dataclass
-from datetime import datetime
-from functools import lru_cache, partial
+from datetime import date, datetime, time
+from functools import lru_cache, partial, singledispatch
 from string import Formatter
-from typing import Any, Dict, Iterator, Union, Iterable
+from threading import Lock
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterator, Mapping, Optional, Tuple, Union, Iterable
 
 load = partial(yaml_load, Loader=Loader)
 
 CREDS_FILENAME_FORMAT = "{0}.creds.yaml"
 CREDS_FILE_KEYS = ["aws_access_key_id", "aws_secret_access_key"]
+# Time based attributes as slices of an ISO 8601 timestamp: YYYY-MM-DDTHH:MM:SS
+DATETIME_ATTRIBUTES = dict(
+    date=slice(0, 10),
+    year=slice(0, 4),
+    month=slice(5, 7),
+    day=slice(8, 10),
+    hour=slice(11, 13),
+    minute=slice(14, 16),
+    second=slice(17, 19),
+)
+YAML_CACHE_SIZE = 100
+
+_yaml_cache: "OrderedDict[str, Tuple[Tuple[int, int], Mapping[str, Any]]]" = OrderedDict()
+_default_attributes_cache: Optional[Mapping[str, str]] = None
+_default_attributes_lock = Lock()
+_FORMATTER = Formatter()
+
+
+@singledispatch
+def _encode_default(o: Any) -> Any:
+    """Parser for types not supported by JSON encoders natively."""
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+@_encode_default.register(abc.Iterable)
+def _encode_iterable(o: Iterable) -> list:
+    return list(o)
+
+
+@_encode_default.register(date)
+@_encode_default.register(time)
+def _encode_isoformat(o: Union[date, time]) -> str:
+    return o.isoformat()
 
 
 class CustomEncoder(json.JSONEncoder):
@@ -28,49 +71,59 @@ class CustomEncoder(json.JSONEncoder):
 
     def default(self, o):
         """Parser for other than native types."""
-        try:
-            return list(iter(o))
-        except TypeError:
-            pass
-
-        try:
-            return o.isoformat()
-        except AttributeError:
-            pass
-
-        return super().default(o)
+        return _encode_default(o)
 
 
 def serialize(obj: Any, filename: str) -> None:
     """Serialize python object to json file.
 
+    Uses `orjson` if available, falls back to the standard library encoder otherwise.
+
     Args:
         obj (Any): Python object to serialize.
         filename (str): Local filename, where the JSON will be stored.
 
     """
+    if orjson:
+        with open(filename, "ab") as f:
+            f.write(
+                orjson.dumps(obj, default=_encode_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+            )
+        return
+
     with open(filename, "a") as f:
         json.dump(obj, f, cls=CustomEncoder)
         f.write("\n")
 
 
-def deserialize(filename: str) -> Any:
+def deserialize(filename: str, skip_invalid: bool = False) -> Any:
     """Deserialize json file to Python object.
 
+    Uses `orjson` if available, falls back to the standard library decoder otherwise.
+
     Args:
         filename (str): File name or path.
+        skip_invalid (bool, optional): Skip lines which can't be decoded instead of raising. Defaults to False.
 
     Returns:
         Any: Pythonic object
 
     """
-    # noqa: D202
+    loads = orjson.loads if orjson else json.loads
+
     def gen():
-        with open(filename, "r") as f:
+        with open(filename, "rb") as f:
             for line in f:
-                yield json.loads(line)
+                try:
+                    yield loads(line)
+                except ValueError:
+                    if not skip_invalid:
+                        raise
+
+    with open(filename, "rb") as f:
+        count = sum(1 for _ in f)
 
-    return gen(), len(open(filename).readlines())
+    return gen(), count
 
 
 def initialize_file(filename: str) -> None:
@@ -84,25 +137,81 @@ def initialize_file(filename: str) -> None:
         pass
 
 
-def _read_yaml_file(filename: Union[str, Path]) -> Dict[str, Any]:
+def _file_signature(filename: Union[str, Path]) -> Optional[Tuple[int, int]]:
+    """Identify a revision of a regular file by its modification time and size.
+
+    Args:
+        filename (Union[str, Path]): File location.
+
+    Returns:
+        Optional[Tuple[int, int]]: Modification time in nanoseconds and size, None if not a regular file.
+
+    """
+    try:
+        file_stat = os.stat(filename)
+    except OSError:
+        return None
+    if not stat.S_ISREG(file_stat.st_mode):
+        return None
+    return file_stat.st_mtime_ns, file_stat.st_size
+
+
+def _freeze(obj: Any) -> Any:
+    """Convert parsed YAML into a read-only structure, so it can be shared safely.
+
+    Args:
+        obj (Any): Parsed YAML node.
+
+    Returns:
+        Any: Mappings are wrapped in MappingProxyType and lists are converted to tuples, recursively.
+
+    """
+    if isinstance(obj, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+
+def _read_yaml_file(filename: Union[str, Path]) -> Mapping[str, Any]:
     """Read a file.
 
+    Parsed files are cached until their modification time or size changes. The result is shared and read-only.
+
     Args:
         filename (str): Configuration file location. Defaults to None.
 
     Returns:
-        Dict[str, Any]: Pythonic representation of the config file.
+        Mapping[str, Any]: Pythonic representation of the config file.
 
     """
+    key = str(filename)
+    signature = _file_signature(filename)
+    cached = _yaml_cache.get(key)
+    if signature and cached and cached[0] == signature:
+        _yaml_cache.move_to_end(key)
+        return cached[1]
+
     with open(filename) as f:
         config = load(f)
 
     if not isinstance(config, dict) or not config.keys():
         raise IOError(f"Invalid config file {filename}")
 
+    config = _freeze(config)
+    if not signature:
+        return config
+
+    _yaml_cache[key] = (signature, config)
+    _yaml_cache.move_to_end(key)
+    if len(_yaml_cache) > YAML_CACHE_SIZE:
+        _yaml_cache.popitem(last=False)
     return config
 
 
+_read_yaml_file.cache_clear = _yaml_cache.clear  # type: ignore
+
+
 def _fetch_creds(path: Path, config: Dict[str, Any]):
     """Fetch credentials for a config section if necessary.
 
@@ -128,7 +237,7 @@ def _fetch_creds(path: Path, config: Dict[str, Any]):
 
 
 @lru_cache
-def _read_creds_file(path: Path, kind: str) -> Dict[str, str]:
+def _read_creds_file(path: Path, kind: str) -> Mapping[str, str]:
     """Read and memoize a credentials file.
 
     Allows to specify unique ID within each 'kind' (dot separated). If the file containing this ID is not found, it
@@ -140,7 +249,7 @@ def _read_creds_file(path: Path, kind: str) -> Dict[str, str]:
             template.
 
     Returns:
-        Dict[str, str]: A dict with the credentials file content.
+        Mapping[str, str]: A read-only mapping with the credentials file content.
 
     Examples:
     >>> _read_creds_file('/etc/solgate', 'source')
@@ -196,41 +305,114 @@ def read_general_config(filename: str, path: Path) -> Dict[str, Any]:
     """
     config = _read_yaml_file(path / filename)
 
-    config.pop("source", None)
-    config.pop("destinations", None)
-
-    return config
+    return {k: v for k, v in config.items() if k not in ("source", "destinations")}
 
 
 @dataclass
 class Parser:
     """Memoized parser pattern and sources attributes set."""
 
-    attributes: set
+    attributes: FrozenSet[str]
     pattern: re.Pattern
 
 
-def _get_param_names(formatter: str):
-    return set(str(p[1]) for p in Formatter().parse(formatter) if p[1])
+@lru_cache(maxsize=256)
+def _get_param_names(formatter: str) -> FrozenSet[str]:
+    return frozenset(p[1] for p in _FORMATTER.parse(formatter) if p[1])
 
 
-@lru_cache
+@lru_cache(maxsize=256)
 def _create_parser(source_formatter: str):
-    source_formatter = source_formatter.replace(".", r"\.")
-    return Parser(
-        _get_param_names(source_formatter), re.compile(r"^" + re.sub(r"{(.*?)}", r"(?P<\g<1>>.*?)", source_formatter))
-    )
+    """Compile a key parser for the source formatter.
+
+    A variable followed by a literal matches lazily, so it ends at the first occurrence of that literal that still
+    allows the rest of the key to match. A variable at the end consumes the rest of the key.
+    """
+    tokens = list(_FORMATTER.parse(source_formatter))
+    pattern = "^"
+    for idx, (literal, name, _, _) in enumerate(tokens):
+        pattern += re.escape(literal)
+        if name is None:
+            continue
+        pattern += f"(?P<{name}>.*)" if idx + 1 == len(tokens) else f"(?P<{name}>.*?)"
+    return Parser(_get_param_names(source_formatter), re.compile(pattern))
+
+
+@lru_cache(maxsize=256)
+def _create_key_pattern(source_formatter: str, unpack: bool) -> re.Pattern:
+    """Compile the full key pattern, optionally matching a compression suffix to be dropped.
+
+    The pattern is meant to be used with `fullmatch`, therefore it isn't anchored at the end.
+    """
+    suffix_pattern = r"\..{2,3}" if unpack else ""
+    return re.compile(_create_parser(source_formatter).pattern.pattern + suffix_pattern)
+
+
+def _default_attributes() -> Mapping[str, str]:
+    """Evaluate time based attributes once per run, so all keys and destinations share the same timestamp."""
+    global _default_attributes_cache
+    if _default_attributes_cache is None:
+        # Transfers run concurrently, make sure only one of them evaluates the timestamp
+        with _default_attributes_lock:
+            if _default_attributes_cache is None:
+                now = datetime.now()
+                timestamp = now.isoformat()
+                _default_attributes_cache = MappingProxyType(
+                    dict(
+                        datetime=timestamp,
+                        **{name: timestamp[span] for name, span in DATETIME_ATTRIBUTES.items()},
+                        weekday=str(now.weekday()),
+                    )
+                )
+    return _default_attributes_cache
+
+
+def _clear_default_attributes() -> None:
+    """Force time based attributes to be evaluated again on the next use."""
+    global _default_attributes_cache
+    _default_attributes_cache = None
+
+
+_default_attributes.cache_clear = _clear_default_attributes  # type: ignore
+
+
+def parse_key(key: str, source_formatter: str, unpack: bool = False) -> Dict[str, str]:
+    """Parse variables out of an object key.
+
+    Args:
+        key (str): Original key.
+        source_formatter (str): Formatter string the key is expected to match.
+        unpack (bool, optional): Expect a compression suffix, which is not a part of any variable. Defaults to False.
+
+    Raises:
+        KeyError: When the key doesn't match the source formatter.
+
+    Returns:
+        Dict[str, str]: Values of the source formatter variables.
+
+    """
+    match = _create_key_pattern(source_formatter, unpack).fullmatch(key)
+    if not match:
+        raise KeyError("Key doesn't match the expected source format")
+
+    return {k: match[k] for k in _create_parser(source_formatter).attributes}
+
+
+def format_key(attributes: Mapping[str, str], destination_formatter: str) -> str:
+    """Format an object key from parsed variables, time based attributes are available as well.
 
+    Args:
+        attributes (Mapping[str, str]): Variables parsed out of the original key via `parse_key`.
+        destination_formatter (str): Formatter string.
+
+    Raises:
+        KeyError: When the destination formatter uses an unknown variable.
+
+    Returns:
+        str: Key in new format.
 
-@lru_cache(1)
-def _default_attributes():
-    now = datetime.now()
-    return dict(
-        datetime=now.isoformat(),
-        date=now.date().isoformat(),
-        **{k: f"{getattr(now, k):02}" for k in ("year", "month", "day", "hour", "minute", "second")},
-        weekday=str(now.weekday()),
-    )
+    """
+    return destination_formatter.format_map(ChainMap(attributes, _default_attributes()))
 
 
 def key_formatter(key: str, source_formatter: str = "", destination_formatter: str = "", **kwargs: dict) -> str:
@@ -272,15 +454,11 @@ def key_formatter(key: str, source_formatter: str = "", destination_formatter: s
         else:
             return key
 
-    parser = _create_parser(source_formatter)
-    suffix_pattern = r"\..{2,3}$" if kwargs.get("unpack") else r"$"
-    pattern = re.compile(parser.pattern.pattern + suffix_pattern)
-
-    match = pattern.match(key)
-    if not match:
-        raise KeyError("Key doesn't match the expected source format")
+    unpack = bool(kwargs.get("unpack"))
+    attributes = parse_key(key, source_formatter, unpack)
 
-    attributes = _default_attributes().copy()
-    attributes.update({k: match[k] for k in parser.attributes})
+    if source_formatter == destination_formatter and not unpack:
+        # Matched variables would be formatted back into the very same key
+        return key
 
-    return destination_formatter.format(**attributes)
+    return format_key(attributes, destination_formatter)
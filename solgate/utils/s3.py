@@ -1,12 +1,17 @@
 """S3FileSystem wrapper."""
 
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from dataclasses import dataclass
-from gzip import GzipFile
-from typing import Any, Callable, Dict, List, Optional, Iterable, Generator, Tuple
+from io import RawIOBase
+from threading import Lock
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Iterable, Generator, Tuple
+from zlib import decompressobj, MAX_WBITS
 
 import s3fs  # type: ignore
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
 
 from .io import read_s3_config
 from .logging import logger
@@ -15,9 +20,86 @@ DEFAULT_ENDPOINTS = dict(source="https://s3.amazonaws.com/", destination="https:
 
 s3fs.S3FileSystem.read_timeout = 18000
 
+DELETE_BATCH_SIZE = 1000
+MAX_INIT_WORKERS = 8
+GUNZIP_CHUNK_SIZE = 256 * 1024
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=MULTIPART_THRESHOLD, multipart_chunksize=8 * 1024 * 1024, max_concurrency=10, use_threads=True
+)
+
+# Boto3 sessions are not thread safe, share a single one and guard resource creation
+_BOTO3_SESSION = boto3.session.Session()
+_BOTO3_SESSION_LOCK = Lock()
+
 S3ConfigSelector = {"source": ("source",), "destination": ("destination",), "all": ("source", "destination")}
 
 
+class _GunzipStream(RawIOBase):
+    """Read-only file-like object decompressing a gzip stream on the fly.
+
+    Thin wrapper around zlib's decompressor, concatenated gzip members are decompressed as a single stream. Each read
+    decompresses at most the requested amount of data, the rest of the compressed input is kept for the next read.
+    """
+
+    def __init__(self, fileobj: BinaryIO) -> None:
+        """Wrap a readable binary file-like object containing gzip data.
+
+        Args:
+            fileobj (BinaryIO): Compressed stream, it is not closed along with this object.
+
+        """
+        super().__init__()
+        self._fileobj = fileobj
+        self._decompressor = decompressobj(16 + MAX_WBITS)
+        self._in_member = False
+
+    def readable(self) -> bool:
+        """Stream is always readable."""
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        """Read decompressed data into a pre-allocated buffer.
+
+        Args:
+            buffer (Any): Writable bytes-like object.
+
+        Returns:
+            int: Number of bytes read, 0 on EOF.
+
+        Raises:
+            EOFError: When the stream ends in the middle of a gzip member.
+
+        """
+        if not len(buffer):
+            return 0
+        while True:
+            decompressor = self._decompressor
+            if decompressor.eof:
+                data = decompressor.unused_data
+                self._decompressor = decompressor = decompressobj(16 + MAX_WBITS)
+            else:
+                data = decompressor.unconsumed_tail
+            if not data:
+                data = self._fileobj.read(GUNZIP_CHUNK_SIZE)
+                if not data:
+                    if self._in_member:
+                        raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+                    return 0
+            if not self._in_member:
+                # Members can be padded with zeros, same as GzipFile skip them before the next header
+                data = data.lstrip(b"\0")
+                if not data:
+                    continue
+
+            chunk = decompressor.decompress(data, len(buffer))
+            self._in_member = not decompressor.eof
+            if chunk:
+                size = len(chunk)
+                buffer[:size] = chunk
+                return size
+
+
 class S3FileSystem:
     """S3FileSystem wrapper."""
 
@@ -44,18 +126,18 @@ class S3FileSystem:
         """
         self.name = name
         self.is_source = name == "source"
-        self.endpoint_url = endpoint_url
-        if not self.endpoint_url:
-            self.endpoint_url = DEFAULT_ENDPOINTS["source"] if self.is_source else DEFAULT_ENDPOINTS["destination"]
+        self.endpoint_url = endpoint_url or DEFAULT_ENDPOINTS["source" if self.is_source else "destination"]
 
         logger.info(
             "Initializing a remote file system",
             dict(name=name, endpoint_url=self.endpoint_url, base_path=base_path, is_source=self.is_source),
         )
         self.__base_path = base_path
+        self._base_prefix = base_path.rstrip("/") + "/"
         parsed_path = base_path.split("/", 1)
         self.bucket = parsed_path.pop(0)
         self.path = "/".join(parsed_path).rstrip("/")
+        self._key_prefix = self.path + "/" if self.path else ""
 
         self.aws_secret_access_key = aws_secret_access_key
         self.aws_access_key_id = aws_access_key_id
@@ -67,12 +149,13 @@ class S3FileSystem:
             secret=self.aws_secret_access_key,
             client_kwargs=dict(endpoint_url=self.endpoint_url),
         )
-        self.s3_client = boto3.resource(
-            "s3",
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key,
-            endpoint_url=self.endpoint_url,
-        )
+        with _BOTO3_SESSION_LOCK:
+            self.s3_client = _BOTO3_SESSION.resource(
+                "s3",
+                aws_access_key_id=self.aws_access_key_id,
+                aws_secret_access_key=self.aws_secret_access_key,
+                endpoint_url=self.endpoint_url,
+            )
         self.boto3 = self.s3_client.Bucket(self.__base_path.split("/")[0])
 
     @classmethod
@@ -91,8 +174,12 @@ class S3FileSystem:
 
         """
         try:
-            config_list = read_s3_config(selector=selector, **config)
-            return [cls(**config) for config in config_list]
+            config_list = list(read_s3_config(selector=selector, **config))
+            if not config_list:
+                return []
+            # Client initialization is I/O bound, instantiate them concurrently while preserving the order
+            with ThreadPoolExecutor(max_workers=min(MAX_INIT_WORKERS, len(config_list))) as executor:
+                return list(executor.map(lambda c: cls(**c), config_list))
         except TypeError:
             raise ValueError("Config file not parseable.")
 
@@ -139,13 +226,24 @@ class S3FileSystem:
         if unpack and mode != "rb":
             raise RuntimeError("Unable to unpack on write.")
 
-        with self.s3fs.open(f"{self.__base_path}/{path}", mode, **kwargs) as f:
+        with self.s3fs.open(self._base_prefix + path, mode, **kwargs) as f:
             if not unpack:
                 yield f
             else:
-                with GzipFile(fileobj=f) as f_unpacked:
+                with _GunzipStream(f) as f_unpacked:
                     yield f_unpacked
 
+    def upload_fileobj(self, fileobj: BinaryIO, path: str) -> None:
+        """Upload a file-like object, large objects are uploaded in parallel multipart chunks.
+
+        Args:
+            fileobj (BinaryIO): Readable file-like object.
+            path (str): Relative path to file within the __base_path.
+
+        """
+        self.s3_client.meta.client.upload_fileobj(fileobj, self.bucket, self._key_prefix + path, Config=TRANSFER_CONFIG)
+        self.s3fs.invalidate_cache(self._base_prefix + path)
+
     def info(self, path: str) -> Dict[str, str]:
         """Fetch file object info metadata.
 
@@ -156,7 +254,25 @@ class S3FileSystem:
             Dict[str, str]: Object metadata
 
         """
-        return {k.lower(): v for k, v in self.s3fs.info(f"{self.__base_path}/{path}").items()}
+        return {k.lower(): v for k, v in self.s3fs.info(self._base_prefix + path).items()}
+
+    def exists(self, path: str) -> bool:
+        """Check whether an object exists, bypassing the s3fs listing cache.
+
+        Args:
+            path (str): Relative path to file within the __base_path.
+
+        Returns:
+            bool: True if the object exists.
+
+        """
+        try:
+            self.s3_client.meta.client.head_object(Bucket=self.bucket, Key=self.bucket_key(path))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
 
     def rm(self, path: str) -> None:
         """Unlink a file.
@@ -165,26 +281,68 @@ class S3FileSystem:
             path (str): Path to file within __base_path.
 
         """
-        return self.s3fs.rm(f"{self.__base_path}/{path}")
+        return self.s3fs.rm(self._base_prefix + path)
+
+    def bucket_key(self, path: str) -> str:
+        """Resolve a path within the __base_path to an object key within the bucket.
+
+        Args:
+            path (str): Relative path to file within the __base_path.
+
+        Returns:
+            str: Object key within the bucket.
+
+        """
+        return (self._key_prefix + path).lstrip("/")
 
-    def copy(self, source_bucket: str, source_key: str, dest_bucket: str, dest_key: str) -> None:
-        """Copy files within a bucket.
+    def delete_objects(self, keys: Iterable[str]) -> None:
+        """Delete multiple objects from the bucket, using as few requests as possible.
+
+        Args:
+            keys (Iterable[str]): Object keys within the bucket.
+
+        Raises:
+            IOError: When any of the objects failed to be deleted, after all batches were attempted.
+
+        """
+        keys = list(dict.fromkeys(keys))
+        errors = []
+        for start in range(0, len(keys), DELETE_BATCH_SIZE):
+            batch = keys[start : start + DELETE_BATCH_SIZE]
+            response = self.s3_client.meta.client.delete_objects(
+                Bucket=self.bucket, Delete=dict(Objects=[dict(Key=k) for k in batch], Quiet=True)
+            )
+            # Quiet mode reports only the keys that failed to be deleted
+            errors.extend(response.get("Errors", []))
+        self.s3fs.invalidate_cache()
+
+        if errors:
+            failed = {e["Key"]: e.get("Message", e.get("Code")) for e in errors}
+            raise IOError(f"Failed to delete objects from bucket {self.bucket}: {failed}")
+
+    def copy(
+        self, source_bucket: str, source_key: str, dest_bucket: str, dest_key: str, dest_path: Optional[str] = None
+    ) -> None:
+        """Copy files server-side, the object data is not streamed through this process.
 
         Args:
             source_bucket (str): Source bucket
             source_key (str): Source key within bucket
             dest_bucket (str): Destination bucket
             dest_key (str): Destination key within destination bucket
+            dest_path (str, optional): Root folder within the destination bucket. Defaults to the root folder of
+                this client.
 
         """
 
         if dest_key is None or dest_key == '':
             dest_key = source_key
+        dest_prefix = self._key_prefix if dest_path is None else dest_path.rstrip("/") + "/"
         copy_source = {
             'Bucket': source_bucket,
-            'Key': '/'.join([self.path, source_key]).lstrip('/')
+            'Key': (self._key_prefix + source_key).lstrip('/')
         }
-        return self.s3_client.meta.client.copy(copy_source, dest_bucket, '/'.join([self.path, dest_key]).lstrip('/'))
+        return self.s3_client.meta.client.copy(copy_source, dest_bucket, (dest_prefix + dest_key).lstrip('/'))
 
     def __eq__(self, other: object) -> bool:
         """Compare S3FileSystem to other objects."""
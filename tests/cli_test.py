@@ -1,128 +1,197 @@
 """Test suite for solgate/cli.py."""
 
+import logging
 from pathlib import Path
+from unittest.mock import create_autospec
+
 from click.testing import CliRunner
 import pytest
 
+import solgate.cli
 from solgate.cli import cli, logger
+from .conftest import FIXTURE_DIR
 
+# Autospeccing is costly, build the mocks once and reset them on each use instead
+CLI_MOCKS = {
+    name: create_autospec(getattr(solgate.cli, name))
+    for name in ("list_source", "serialize", "initialize_file", "send", "deserialize", "send_report")
+}
 
-@pytest.fixture
+
+@pytest.fixture(scope="session")
 def run():
     """Run CLI command from within the solgate command context."""
     runner = CliRunner()
     return lambda args, env={}: runner.invoke(cli, args, env=env)
 
 
+@pytest.fixture(scope="session")
+def run_no_output():
+    """Run CLI command from within the solgate command context, when only the exit code matters."""
+    runner = CliRunner()
+    return lambda args, env={}: runner.invoke(cli, args, env=env, catch_exceptions=False)
+
+
+@pytest.fixture
+def patch_cli(monkeypatch):
+    """Patch a solgate.cli dependency with its cached autospecced mock."""
+    # pydocstyle: D202
+    def _patch(name, return_value=None, side_effect=None):
+        mocked = CLI_MOCKS[name]
+        mocked.reset_mock()
+        mocked.return_value = return_value
+        mocked.side_effect = side_effect
+        monkeypatch.setattr(solgate.cli, name, mocked)
+        return mocked
+
+    return _patch
+
+
+@pytest.fixture(scope="module")
+def _log_handler_records():
+    """Collect records emitted by the solgate logger within the module."""
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger.addHandler(handler)
+    yield records
+    logger.removeHandler(handler)
+
+
+@pytest.fixture
+def log_records(_log_handler_records):
+    """Collect records emitted by the solgate logger during the test."""
+    _log_handler_records.clear()
+    return _log_handler_records
+
+
+@pytest.mark.slow_startup
 def test_version(run):
     """Should return someting for version command."""
     assert "Solgate version" in run(["version"]).output
 
 
+DEFAULT_CONTEXT = dict(filename="config.yaml", path=Path("/etc/solgate"))
+
+
 def context(**kwargs):
     """Dynamic fixture for parametrized tests updating default config."""
-    defaults = dict(filename="config.yaml", path=Path("/etc/solgate"))
-    defaults.update(kwargs)
-    return defaults
+    return {**DEFAULT_CONTEXT, **kwargs}
 
 
-@pytest.mark.parametrize(
-    "cli_args,func_args,file_output",
-    [
-        (["list"], [context(), False], False),
-        (["list", "--backfill", "false"], [context(), False], False),
-        (["list", "--backfill", "true"], [context(), True], False),
-        (["-c", ".", "list"], [context(path=Path(".")), False], False),
-        (["list", "-o", "output.json"], [context(), False], True),
-    ],
-)
-def test_list(run, mocker, cli_args, func_args, file_output):
+# Cases are independent and cheap, run them in a single test to share the mocks setup
+LIST_CASES = [
+    (["list"], [context(), False], False),
+    (["list", "--backfill", "false"], [context(), False], False),
+    (["list", "--backfill", "true"], [context(), True], False),
+    (["-c", ".", "list"], [context(path=Path(".")), False], False),
+    (["list", "-o", "output.json"], [context(), False], True),
+]
+
+
+def test_list(run, mocker, patch_cli):
     """Should call proper functions on list command."""
-    mocked_list_source = mocker.patch("solgate.cli.list_source", return_value=["list", "of", "files"])
-    mocked_serialize = mocker.patch("solgate.cli.serialize")
-    mocked_initialize_file = mocker.patch("solgate.cli.initialize_file")
+    mocked_list_source = patch_cli("list_source")
+    mocked_serialize = patch_cli("serialize")
+    mocked_initialize_file = patch_cli("initialize_file")
 
-    result = run(cli_args)
+    for cli_args, func_args, file_output in LIST_CASES:
+        for mocked in (mocked_list_source, mocked_serialize, mocked_initialize_file):
+            mocked.reset_mock()
+        mocked_list_source.return_value = ["list", "of", "files"]
 
-    assert result.exit_code == 0
-    mocked_list_source.assert_called_once_with(*func_args)
-    mocked_initialize_file.assert_called_once()
+        result = run(cli_args)
 
-    if file_output:
-        calls = [mocker.call(f, "output.json") for f in ("list", "of", "files")]
-        mocked_serialize.assert_has_calls(calls)
-    else:
-        mocked_serialize.assert_not_called()
-        assert "list\nof\nfiles\n" in result.output
+        assert result.exit_code == 0, cli_args
+        mocked_list_source.assert_called_once_with(*func_args)
+        mocked_initialize_file.assert_called_once()
+
+        if file_output:
+            calls = [mocker.call(f, "output.json") for f in ("list", "of", "files")]
+            mocked_serialize.assert_has_calls(calls)
+        else:
+            mocked_serialize.assert_not_called()
+            assert "list\nof\nfiles\n" in result.output, cli_args
 
 
 @pytest.mark.parametrize(
     "side_effect,errno", [(RuntimeError, 1), (ValueError("msg"), 2), (FileNotFoundError("msg"), 3),],
 )
-def test_list_negative(run, mocker, side_effect, errno):
+def test_list_negative(run_no_output, patch_cli, side_effect, errno):
     """Should fail on list command."""
-    mocker.patch("solgate.cli.list_source", side_effect=side_effect)
-    mocker.patch("solgate.cli.initialize_file")
+    patch_cli("list_source", side_effect=side_effect)
+    patch_cli("initialize_file")
 
-    result = run("list")
+    result = run_no_output("list")
 
     assert result.exit_code == errno
 
 
-@pytest.mark.parametrize(
-    "cli_args,func_args",
-    [
-        (["send", "key"], [[dict(key="key")], context(), 1, False]),
-        (["send", "-l", "."], [[dict(key="file/key")], context(), 1, False]),
-        (["-c", ".", "send", "key"], [[dict(key="key")], context(path=Path(".")), 1, False]),
-        (["send", "key", "--dry-run"], [[dict(key="key")], context(), 1, True]),
-        (["send", "key", "-n"], [[dict(key="key")], context(), 1, True]),
-    ],
-)
-def test_send(run, mocker, cli_args, func_args):
+SEND_CASES = [
+    (["send", "key"], [[dict(key="key")], context(), 1, False, None, 8]),
+    (["send", "-l", "."], [[dict(key="file/key")], context(), 1, False, None, 8]),
+    (["-c", ".", "send", "key"], [[dict(key="key")], context(path=Path(".")), 1, False, None, 8]),
+    (["send", "key", "--dry-run"], [[dict(key="key")], context(), 1, True, None, 8]),
+    (["send", "key", "-n"], [[dict(key="key")], context(), 1, True, None, 8]),
+    (["send", "key", "--checkpoint-file", "c.json"], [[dict(key="key")], context(), 1, False, "c.json", 8]),
+    (["send", "key", "-w", "1"], [[dict(key="key")], context(), 1, False, None, 1]),
+    (["send", "key", "--workers", "16"], [[dict(key="key")], context(), 1, False, None, 16]),
+]
+
+
+def test_send(run, patch_cli):
     """Should call proper functions on sync command."""
-    mocked_send = mocker.patch("solgate.cli.send")
-    mocker.patch("solgate.cli.deserialize", return_value=([dict(key="file/key")], 1))
+    mocked_send = patch_cli("send")
+    patch_cli("deserialize", return_value=([dict(key="file/key")], 1))
 
-    result = run(cli_args)
+    for cli_args, func_args in SEND_CASES:
+        mocked_send.reset_mock()
 
-    assert result.exit_code == 0
-    mocked_send.assert_called_once_with(*func_args)
+        result = run(cli_args)
 
+        assert result.exit_code == 0, cli_args
+        mocked_send.assert_called_once_with(*func_args)
 
-@pytest.mark.parametrize(
-    "side_effect,cli_args,errno",
-    [
-        (RuntimeError, ["send", "key"], 1),
-        (ValueError("msg"), ["send"], 2),
-        (FileNotFoundError("msg"), ["send", "key"], 3),
-        (IOError("msg"), ["send", "key"], 4),
-    ],
-)
-def test_send_negative(run, mocker, side_effect, cli_args, errno):
+
+SEND_NEGATIVE_CASES = [
+    (RuntimeError, ["send", "key"], 1),
+    (ValueError("msg"), ["send"], 2),
+    (FileNotFoundError("msg"), ["send", "key"], 3),
+    (IOError("msg"), ["send", "key"], 4),
+]
+
+
+def test_send_negative(run_no_output, patch_cli):
     """Should fail on sync failure."""
-    mocker.patch("solgate.cli.send", side_effect=side_effect)
+    mocked_send = patch_cli("send")
 
-    result = run(cli_args)
+    for side_effect, cli_args, errno in SEND_NEGATIVE_CASES:
+        mocked_send.side_effect = side_effect
 
-    assert result.exit_code == errno
+        result = run_no_output(cli_args)
+
+        assert result.exit_code == errno, cli_args
 
 
 context_keys = ["name", "namespace", "status", "host", "timestamp"]
+EMPTY_REPORT_CONTEXT = dict.fromkeys(context_keys)
+FULL_REPORT_CONTEXT = dict(zip(context_keys, context_keys))
+
+REPORT_FULL_ARGS = (
+    "report "
+    "-n name --failures failures --namespace namespace -s status --host host -t timestamp "
+    "--from nobody@example.com --to somebody@example.com --smtp smtp.example.com"
+).split()
 
 
 @pytest.mark.parametrize(
     "cli_args,func_args,env",
     [
-        (["report"], [[None, None, None, None, None], "", {}], dict()),
+        (["report"], [EMPTY_REPORT_CONTEXT, "", {}], dict()),
         (
-            (
-                "report "
-                "-n name --failures failures --namespace namespace -s status --host host -t timestamp "
-                "--from nobody@example.com --to somebody@example.com --smtp smtp.example.com"
-            ).split(),
+            REPORT_FULL_ARGS,
             [
-                context_keys,
+                FULL_REPORT_CONTEXT,
                 "failures",
                 dict(
                     alerts_from="nobody@example.com",
@@ -135,7 +204,7 @@ context_keys = ["name", "namespace", "status", "host", "timestamp"]
         (
             ["report"],
             [
-                context_keys,
+                FULL_REPORT_CONTEXT,
                 "failures",
                 dict(
                     alerts_from="nobody@example.com",
@@ -158,7 +227,7 @@ context_keys = ["name", "namespace", "status", "host", "timestamp"]
         (
             ["-c", "REPLACED_WITH_FIXTURE_DIR", "--config-filename", "general_section_only.yaml", "report"],
             [
-                [None, None, None, None, None],
+                EMPTY_REPORT_CONTEXT,
                 "",
                 dict(
                     alerts_from="solgate@example.com",
@@ -170,32 +239,29 @@ context_keys = ["name", "namespace", "status", "host", "timestamp"]
         ),
     ],
 )
-def test_report(run, mocker, cli_args, func_args, fixture_dir, env):
+def test_report(run, patch_cli, log_records, cli_args, func_args, env):
     """Should call send_report on report reprot command."""
-    mocked_report = mocker.patch("solgate.cli.send_report")
+    mocked_report = patch_cli("send_report")
 
-    logger_spy = None
     if cli_args[0] == "-c":
-        cli_args[1] = fixture_dir
-    else:
-        # If config wasn't specified, spy for a warning
-        logger_spy = mocker.spy(logger, "warning")
+        cli_args[1] = FIXTURE_DIR
 
     run(cli_args, env)
 
-    func_args[0] = {k: v for k, v in zip(context_keys, func_args[0])}
     mocked_report.assert_called_once_with(*func_args)
 
-    if logger_spy:
-        logger_spy.assert_called_once_with(
-            "Config file is not present or not valid, alerting to/from default email address."
-        )
+    warnings = [r.getMessage() for r in log_records if r.levelno == logging.WARNING]
+    if cli_args[0] == "-c":
+        assert warnings == []
+    else:
+        # If config wasn't specified, expect a warning
+        assert warnings == ["Config file is not present or not valid, alerting to/from default email address."]
 
 
-def test_report_negative(run, mocker):
+def test_report_negative(run_no_output, patch_cli):
     """Should fail on list command."""
-    mocker.patch("solgate.cli.list_source", side_effects=ValueError("msg"))
+    patch_cli("list_source", side_effect=ValueError("msg"))
 
-    result = run("report")
+    result = run_no_output("report")
 
     assert result.exit_code == 2
@@ -1,38 +1,70 @@
 """Contest for solgate testsuite."""
 
 from pathlib import Path
-from importlib import reload
+from types import SimpleNamespace
+from unittest import mock
 
 import pytest
 import s3fs
 import boto3
 from moto import mock_s3
+from moto.s3.models import s3_backend
 from solgate.utils import S3FileSystem
 
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+
 
 @pytest.fixture(scope="session")
 def fixture_dir():
     """Locate fixtures directory in the test folder."""
-    return Path(__file__).absolute().parent / "fixtures"
+    return FIXTURE_DIR
 
 
-@pytest.fixture
-def mocked_s3(fixture_dir, request):
-    """Yield S3FileSystem S3 clients with mocked backend."""
+@pytest.fixture(scope="module")
+def _mocked_s3_backend():
+    """Keep the mocked S3 backend running for the whole module, caching S3 clients per config file."""
     with mock_s3():
-        s3fs_instances = S3FileSystem.from_config_file(dict(path=fixture_dir, filename=request.param))
-        for instance in s3fs_instances:
-            instance.s3fs = s3fs.S3FileSystem(key=instance.aws_access_key_id, secret=instance.aws_secret_access_key)
-            instance.s3fs.s3.create_bucket(Bucket=instance._S3FileSystem__base_path.split("/")[0])
-            instance.s3_client = boto3.resource(
-                "s3", aws_access_key_id=instance.aws_access_key_id, aws_secret_access_key=instance.aws_secret_access_key
-            )
-            instance.s3c = boto3.client(
-                "s3", aws_access_key_id=instance.aws_access_key_id, aws_secret_access_key=instance.aws_secret_access_key
-            )
-            instance.boto3 = instance.s3_client.Bucket(instance._S3FileSystem__base_path.split("/")[0])
-            instance.s3_client.create_bucket(Bucket=instance._S3FileSystem__base_path.split("/")[0])
-        yield s3fs_instances
+        yield SimpleNamespace(clients=dict(), buckets=set())
+
+
+def _ensure_bucket(instance, buckets):
+    """Create the instance's bucket in the mocked backend unless it already exists."""
+    bucket = instance._S3FileSystem__base_path.split("/")[0]
+    if bucket not in buckets:
+        instance.s3fs.s3.create_bucket(Bucket=bucket)
+        buckets.add(bucket)
+
+
+def _create_mocked_s3_file_systems(path, filename, buckets):
+    """Instantiate S3FileSystem S3 clients from a config file and bind them to the mocked backend."""
+    s3fs_instances = S3FileSystem.from_config_file(dict(path=path, filename=filename))
+    for instance in s3fs_instances:
+        instance.s3fs = s3fs.S3FileSystem(key=instance.aws_access_key_id, secret=instance.aws_secret_access_key)
+        _ensure_bucket(instance, buckets)
+        instance.s3_client = boto3.resource(
+            "s3", aws_access_key_id=instance.aws_access_key_id, aws_secret_access_key=instance.aws_secret_access_key
+        )
+        instance.s3c = boto3.client(
+            "s3", aws_access_key_id=instance.aws_access_key_id, aws_secret_access_key=instance.aws_secret_access_key
+        )
+        instance.boto3 = instance.s3_client.Bucket(instance._S3FileSystem__base_path.split("/")[0])
+    return s3fs_instances
+
+
+@pytest.fixture
+def mocked_s3(_mocked_s3_backend, request):
+    """Yield S3FileSystem S3 clients with mocked backend, emptied before each test."""
+    clients = _mocked_s3_backend.clients
+    if request.param not in clients:
+        clients[request.param] = _create_mocked_s3_file_systems(FIXTURE_DIR, request.param, _mocked_s3_backend.buckets)
+    s3fs_instances = clients[request.param]
+
+    for bucket in s3_backend.buckets.values():
+        bucket.keys.clear()
+    for instance in s3fs_instances:
+        instance.s3fs.invalidate_cache()
+
+    return s3fs_instances
 
 
 @pytest.fixture
@@ -45,6 +77,25 @@ def mocked_solgate_s3_file_system(mocker):
 
 @pytest.fixture
 def disable_backoff(mocker, request):
-    """Disable backoff retry decorator."""
-    mocker.patch("backoff.on_exception", lambda *_, **__: lambda x: x)
-    reload(request.param)
+    """Disable retries by allowing a single attempt only."""
+    mocker.patch.object(request.param, "_MAX_RETRIES", 1)
+
+
+@pytest.fixture(scope="module")
+def _smtp_patcher():
+    """Patch smtplib.SMTP once per module."""
+    with mock.patch("smtplib.SMTP") as mocked_smtp:
+        yield mocked_smtp
+
+
+@pytest.fixture
+def smtp(_smtp_patcher):
+    """SMTP fixture as a mock."""
+    _smtp_patcher.reset_mock()
+
+    def _get_sent_message():
+        return _smtp_patcher.return_value.__enter__.return_value.send_message.call_args.args[0]
+
+    _smtp_patcher.get_sent_message = _get_sent_message
+
+    return _smtp_patcher
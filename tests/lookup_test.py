@@ -1,11 +1,26 @@
 """Test suite for solgate/lookup.py."""
 
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
 
 import pytest
 from moto.s3.models import s3_backend
 
 from solgate import lookup
+from solgate.utils import S3FileSystem
+
+
+@pytest.fixture
+def fake_fs(mocker):
+    """Stub S3FileSystem holding a single old object, without mocking S3."""
+    fs = mocker.Mock(spec=S3FileSystem)
+    old = SimpleNamespace(
+        key="old.csv", e_tag='"etag"', size=0, last_modified=datetime(2020, 1, 1, tzinfo=timezone.utc)
+    )
+    fs.find.side_effect = lambda constraint: filter(constraint, [old])
+    mocker.patch("solgate.lookup.S3FileSystem.from_config_file", return_value=[fs])
+
+    return fs
 
 
 @pytest.mark.parametrize(
@@ -61,29 +76,17 @@ def test_list_source_invalid_config(mocker):
         list(lookup.list_source({}))
 
 
-@pytest.mark.parametrize("mocked_s3", ["same_client.yaml"], indirect=["mocked_s3"])
-def test_list_source_no_objects(mocked_s3, mocker):
+def test_list_source_no_objects(fake_fs, mocker):
     """Should raise when no files found."""
-    fs = mocked_s3[0]
     mocker.patch("solgate.lookup.read_general_config", return_value=dict())
-    mocker.patch("solgate.lookup.S3FileSystem.from_config_file", return_value=[fs])
-
-    fs.s3fs.touch("BUCKET/old.csv")
-    s3_backend.buckets["BUCKET"].keys["old.csv"].last_modified = datetime(2020, 1, 1)
 
     with pytest.raises(FileNotFoundError):
         list(lookup.list_source({}))
 
 
-@pytest.mark.parametrize("mocked_s3", ["same_client.yaml"], indirect=["mocked_s3"])
-def test_list_source_ignored_no_objects(mocked_s3, mocker):
+def test_list_source_ignored_no_objects(fake_fs, mocker):
     """Should raise when no files found."""
-    fs = mocked_s3[0]
     mocker.patch("solgate.lookup.read_general_config", return_value=dict(ignore_alerts=["no_files"]))
-    mocker.patch("solgate.lookup.S3FileSystem.from_config_file", return_value=[fs])
-
-    fs.s3fs.touch("BUCKET/old.csv")
-    s3_backend.buckets["BUCKET"].keys["old.csv"].last_modified = datetime(2020, 1, 1)
 
     try:
         list(lookup.list_source({}))
@@ -91,14 +94,8 @@ def test_list_source_ignored_no_objects(mocked_s3, mocker):
         pytest.fail("Unexpected FileNotFoundError raised despite ignore flag")
 
 
-@pytest.mark.parametrize("mocked_s3", ["same_client.yaml"], indirect=["mocked_s3"])
-def test_list_source_backfill(mocked_s3, mocker):
+def test_list_source_backfill(fake_fs, mocker):
     """Should list all files when backfill is enabled."""
-    fs = mocked_s3[0]
     mocker.patch("solgate.lookup.read_general_config", return_value=dict())
-    mocker.patch("solgate.lookup.S3FileSystem.from_config_file", return_value=[fs])
-
-    fs.s3fs.touch("BUCKET/old.csv")
-    s3_backend.buckets["BUCKET"].keys["old.csv"].last_modified = datetime(2020, 1, 1)
 
     assert len(list(lookup.list_source({}, True))) == 1
@@ -1,11 +1,22 @@
 """Test suite for solgate/report.py."""
 
+from io import StringIO
 from json import dumps
 import pytest
 
 from solgate import report
 from solgate.utils import EXIT_CODES
 
+_FAILURE = {
+    "displayName": "failed-step-name",
+    "message": "failed with exit code 1",
+    "templateName": "template_x_y_z",
+    "podName": "failed-step-name-pod-123456",
+    "phase": "Failed",
+    "finishedAt": "2020-01-01 10:00:00 +0000 UTC",
+}
+_SERIALIZED_FAILURES = f'"{dumps([_FAILURE])}"'
+
 
 @pytest.fixture
 def context() -> dict:
@@ -19,23 +30,9 @@ def context() -> dict:
     )
 
 
-@pytest.fixture
-def smtp(mocker):
-    """SMTP fixture as a mock."""
-    mocked_smtp = mocker.patch("smtplib.SMTP")
-
-    def _get_sent_message():
-        return mocked_smtp.return_value.__enter__.return_value.send_message.call_args.args[0]
-
-    mocked_smtp.get_sent_message = _get_sent_message
-
-    return mocked_smtp
-
-
 def test_render_from_template(mocker):
     """Should render Jinja2."""
-    mocked_open = mocker.mock_open(read_data="{{ variable }}\n")
-    mocker.patch("builtins.open", mocked_open)
+    mocker.patch("builtins.open", side_effect=lambda *_, **__: StringIO("{{ variable }}\n"))
     assert report.render_from_template("stub_filename", dict(variable="value")) == "value"
 
 
@@ -72,22 +69,13 @@ def test_send_report_no_context(smtp):
 
 def test_send_report_with_failures(context, smtp):
     """Should render failures."""
-    failure = {
-        "displayName": "failed-step-name",
-        "message": "failed with exit code 1",
-        "templateName": "template_x_y_z",
-        "podName": "failed-step-name-pod-123456",
-        "phase": "Failed",
-        "finishedAt": "2020-01-01 10:00:00 +0000 UTC",
-    }
-    failures = f'"{dumps([failure])}"'
-    report.send_report(context, failures, {})
+    report.send_report(context, _SERIALIZED_FAILURES, {})
 
     for p in smtp.get_sent_message().iter_parts():
         content = p.get_content()
         assert EXIT_CODES[1].msg in content
         assert "Failures:" in content
-        assert all([v in content for v in failure.values()])
+        assert all([v in content for v in _FAILURE.values()])
 
 
 @pytest.mark.parametrize(
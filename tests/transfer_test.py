@@ -1,10 +1,12 @@
 """Test suite for solgate/transfer.py."""
 
+import gzip
+import time
 from pathlib import Path
 import pytest
 
 from solgate import transfer
-from solgate.utils import S3File
+from solgate.utils import S3File, io
 
 
 @pytest.mark.parametrize(
@@ -23,7 +25,7 @@ def test_send(mocker, file_list, dry_run, mocked_solgate_s3_file_system):
 
     for idx, f in enumerate(file_list):
         mocked_transfer_single_file.assert_any_call(
-            f["key"], [mocked_solgate_s3_file_system], idx, len(file_list), dry_run
+            f["key"], [mocked_solgate_s3_file_system], idx, len(file_list), dry_run, mocker.ANY
         )
 
 
@@ -46,6 +48,73 @@ def test_send_no_key(mocker, file_list, mocked_solgate_s3_file_system, exception
         )
 
 
+@pytest.mark.parametrize(
+    "checkpointed_etag,transferred",
+    [
+        (None, ["a/b/file1.csv", "a/b/file2.csv"]),
+        ("ETAG", ["a/b/file2.csv"]),
+        ("CHANGED", ["a/b/file1.csv", "a/b/file2.csv"]),
+    ],
+)
+def test_send_checkpoint(mocker, tmp_path, mocked_solgate_s3_file_system, checkpointed_etag, transferred):
+    """Should skip files recorded in the checkpoint file and record newly transferred files."""
+    mocked_transfer_single_file = mocker.patch("solgate.transfer._transfer_single_file")
+    mocked_solgate_s3_file_system.info.return_value = dict(etag="ETAG")
+    checkpoint_file = tmp_path / "checkpoint.json"
+    checkpoint_file.touch()
+    if checkpointed_etag:
+        io.serialize(dict(key="a/b/file1.csv", etag=checkpointed_etag), checkpoint_file)
+
+    file_list = [dict(key="a/b/file1.csv"), dict(key="a/b/file2.csv")]
+    transfer.send(file_list, {}, len(file_list), checkpoint_file=str(checkpoint_file))
+
+    assert sorted(c.args[0] for c in mocked_transfer_single_file.call_args_list) == transferred
+    assert {r["key"]: r["etag"] for r in io.deserialize(checkpoint_file)[0]} == {
+        "a/b/file1.csv": "ETAG",
+        "a/b/file2.csv": "ETAG",
+    }
+
+
+def test_send_checkpoint_incomplete_record(mocker, tmp_path, mocked_solgate_s3_file_system):
+    """Should ignore a truncated checkpoint record."""
+    mocked_transfer_single_file = mocker.patch("solgate.transfer._transfer_single_file")
+    mocked_solgate_s3_file_system.info.return_value = dict(etag="ETAG")
+    checkpoint_file = tmp_path / "checkpoint.json"
+    checkpoint_file.write_text('{"key": "a/b/file1.csv", "etag": "ETAG"}\n{"key": "a/b/fi')
+
+    transfer.send([dict(key="a/b/file1.csv"), dict(key="a/b/file2.csv")], {}, 2, checkpoint_file=str(checkpoint_file))
+
+    assert [c.args[0] for c in mocked_transfer_single_file.call_args_list] == ["a/b/file2.csv"]
+
+
+def test_send_checkpoint_resume_after_incomplete_record(mocker, tmp_path, mocked_solgate_s3_file_system):
+    """Should keep records appended after a truncated one readable in following runs."""
+    mocked_transfer_single_file = mocker.patch("solgate.transfer._transfer_single_file")
+    mocked_solgate_s3_file_system.info.return_value = dict(etag="ETAG")
+    checkpoint_file = tmp_path / "checkpoint.json"
+    checkpoint_file.write_text('{"key": "a/b/fi')
+
+    transfer.send([dict(key="a/b/file1.csv")], {}, 1, checkpoint_file=str(checkpoint_file))
+    transfer.send([dict(key="a/b/file2.csv")], {}, 1, checkpoint_file=str(checkpoint_file))
+    transfer.send([dict(key="a/b/file1.csv"), dict(key="a/b/file2.csv")], {}, 2, checkpoint_file=str(checkpoint_file))
+
+    assert [c.args[0] for c in mocked_transfer_single_file.call_args_list] == ["a/b/file1.csv", "a/b/file2.csv"]
+    assert transfer._read_checkpoint(str(checkpoint_file)) == {"a/b/file1.csv": "ETAG", "a/b/file2.csv": "ETAG"}
+
+
+def test_send_checkpoint_dry_run(mocker, tmp_path, mocked_solgate_s3_file_system):
+    """Should only read the checkpoint file during a dry run."""
+    mocker.patch("solgate.transfer._transfer_single_file")
+    mocked_solgate_s3_file_system.info.return_value = dict(etag="ETAG")
+    checkpoint_file = tmp_path / "checkpoint.json"
+    content = '{"key": "a/b/file1.csv", "etag": "ETAG"}\n{"key": "a/b/fi'
+    checkpoint_file.write_text(content)
+
+    transfer.send([dict(key="a/b/file1.csv"), dict(key="a/b/file2.csv")], {}, 2, True, str(checkpoint_file))
+
+    assert checkpoint_file.read_text() == content
+
+
 def test_send_no_client(mocker):
     """Should re-raise exception if config is not parseable."""
     mocked_s3_fs = mocker.patch("solgate.transfer.S3FileSystem")
@@ -75,6 +144,97 @@ def test_send_unable_to_transfer(mocker, mocked_solgate_s3_file_system):
     logger_spy.assert_called_once_with("Max retries reached", mocker.ANY, exc_info=True)
 
 
+@pytest.mark.parametrize("mocked_s3", ["sample_config.yaml"], indirect=["mocked_s3"])
+@pytest.mark.parametrize("disable_backoff", [transfer], indirect=["disable_backoff"])
+def test_send_rollback(mocked_s3, disable_backoff, mocker):
+    """Should delete destinations created by failed transfers in bulk, once per bucket."""
+    mocker.patch("solgate.transfer.S3FileSystem.from_config_file", return_value=mocked_s3)
+    keys = ["2020-01-01/collection_name.csv.gz", "2020-01-02/collection_name.csv.gz"]
+    for key in keys:
+        with mocked_s3[0].open(key, "wb") as f, gzip.open(f, "wb") as f_packed:
+            f_packed.write(b"foo")
+    latest = "DH-PLAYPEN/storage/output/collection_name/latest/full_data.csv"
+    mocked_s3[0].s3fs.touch(latest)
+    mocker.patch("solgate.transfer.verify", return_value=False)
+    spies = [mocker.spy(client, "delete_objects") for client in mocked_s3]
+
+    with pytest.raises(IOError):
+        transfer.send([dict(key=key) for key in keys], {}, len(keys), max_workers=1)
+
+    calls = [c for spy in spies for c in spy.call_args_list]
+    assert len(calls) == 1
+    assert sorted(set(calls[0].args[0])) == [
+        "storage/output/2020-01-01/collection_name.csv.gz",
+        "storage/output/2020-01-02/collection_name.csv.gz",
+        "storage/output/collection_name/historic/2020-01-01-collection_name.csv",
+        "storage/output/collection_name/historic/2020-01-02-collection_name.csv",
+    ]
+    assert mocked_s3[0].s3fs.exists(latest)
+    assert all(mocked_s3[0].s3fs.exists(f"DH-PLAYPEN/storage/input/{key}") for key in keys)
+
+
+@pytest.mark.parametrize("mocked_s3", ["sample_config.yaml"], indirect=["mocked_s3"])
+@pytest.mark.parametrize("disable_backoff", [transfer], indirect=["disable_backoff"])
+def test_send_rollback_shared_destination(mocked_s3, disable_backoff, mocker):
+    """Should keep destinations written by a successful transfer within the same run."""
+    mocker.patch("solgate.transfer.S3FileSystem.from_config_file", return_value=mocked_s3)
+    keys = ["2020-01-01/collection_name.csv.gz", "2020-01-02/collection_name.csv.gz"]
+    for key in keys:
+        with mocked_s3[0].open(key, "wb") as f, gzip.open(f, "wb") as f_packed:
+            f_packed.write(b"foo")
+    mocker.patch("solgate.transfer.verify", side_effect=lambda files, dry_run=False: files[0].key == keys[0])
+
+    with pytest.raises(IOError):
+        transfer.send([dict(key=key) for key in keys], {}, len(keys), max_workers=2)
+
+    output = "DH-PLAYPEN/storage/output"
+    assert mocked_s3[0].s3fs.exists(f"{output}/collection_name/latest/full_data.csv")
+    assert mocked_s3[0].s3fs.exists(f"{output}/collection_name/historic/2020-01-01-collection_name.csv")
+    assert mocked_s3[0].s3fs.exists(f"{output}/2020-01-01/collection_name.csv.gz")
+    assert not mocked_s3[0].s3fs.exists(f"{output}/collection_name/historic/2020-01-02-collection_name.csv")
+    assert not mocked_s3[0].s3fs.exists(f"{output}/2020-01-02/collection_name.csv.gz")
+
+
+@pytest.mark.parametrize("mocked_s3", ["sample_config.yaml"], indirect=["mocked_s3"])
+def test_send_shared_destination_order(mocked_s3, mocker):
+    """Should write objects sharing a destination one at a time, in the listing order."""
+    # pydocstyle: D202
+    def transfer_single_file(key, *args):
+        events.append(("start", key))
+        if key == keys[0]:
+            time.sleep(0.2)
+        original(key, *args)
+        events.append(("end", key))
+
+    mocker.patch("solgate.transfer.S3FileSystem.from_config_file", return_value=mocked_s3)
+    keys = ["2020-01-01/collection_name.csv.gz", "2020-01-02/collection_name.csv.gz"]
+    for key in keys:
+        with mocked_s3[0].open(key, "wb") as f, gzip.open(f, "wb") as f_packed:
+            f_packed.write(key.encode())
+    events = []
+    original = transfer._transfer_single_file
+    mocker.patch.object(transfer, "_transfer_single_file", side_effect=transfer_single_file)
+
+    transfer.send([dict(key=key) for key in keys], {}, len(keys), max_workers=2)
+
+    assert events == [("start", keys[0]), ("end", keys[0]), ("start", keys[1]), ("end", keys[1])]
+    with mocked_s3[0].s3fs.open("DH-PLAYPEN/storage/output/collection_name/latest/full_data.csv", "rb") as f:
+        assert f.read() == keys[1].encode()
+
+
+@pytest.mark.parametrize("mocked_s3", ["sample_config.yaml"], indirect=["mocked_s3"])
+def test__rollback_failed_deletion(mocked_s3, mocker):
+    """Should log objects that failed to be deleted instead of passing silently."""
+    logger_spy = mocker.spy(transfer.logger, "error")
+    mocked = mocker.patch.object(mocked_s3[1].s3_client.meta.client, "delete_objects")
+    mocked.return_value = dict(Errors=[dict(Key="output/file.csv", Code="AccessDenied")])
+
+    transfer._rollback(mocked_s3[0], [("file.csv", [S3File(mocked_s3[1], "file.csv")])])
+
+    mocked.assert_called_once()
+    logger_spy.assert_called_once_with("Failed to roll back", mocker.ANY, exc_info=True)
+
+
 @pytest.mark.parametrize("mocked_s3", ["sample_config.yaml"], indirect=["mocked_s3"])
 def test_calc_s3_files(mocked_s3):
     """Should return parsed object keys for source and all destinations with formatter."""
@@ -88,6 +248,16 @@ def test_calc_s3_files(mocked_s3):
     ]
 
 
+@pytest.mark.parametrize("mocked_s3", ["sample_config.yaml"], indirect=["mocked_s3"])
+def test_calc_s3_files_parse_once(mocked_s3, mocker):
+    """Should parse the source key once for all destinations sharing the unpack flag."""
+    spy = mocker.spy(transfer, "parse_key")
+
+    list(transfer.calc_s3_files("2020-01-01/collection_name.csv.gz", mocked_s3))
+
+    spy.assert_called_once_with("2020-01-01/collection_name.csv.gz", "{date}/{collection}.{ext}", True)
+
+
 @pytest.mark.parametrize("mocked_s3", ["without_source_formatter.yaml"], indirect=["mocked_s3"])
 def test_calc_s3_files_without_formatter(mocked_s3):
     """Should return parsed object keys for source and all destinations without formatter."""
@@ -154,16 +324,40 @@ def test__transfer_single_file_unable_to_verify(mocked_s3, disable_backoff, mock
 
 @pytest.mark.parametrize("mocked_s3", ["sample_config.yaml"], indirect=["mocked_s3"])
 @pytest.mark.parametrize("disable_backoff", [transfer], indirect=["disable_backoff"])
-def test__transfer_single_file_fails(mocked_s3, disable_backoff):
+def test__transfer_single_file_fails(mocked_s3, disable_backoff, mocker):
     """Should return False if unable to transfer."""
     mocked_s3[0].s3fs.touch("DH-PLAYPEN/storage/input/2020-01-01/collection_name.csv.gz")
-    destination_client = mocked_s3[1]
-    destination_client._S3FileSystem__base_path = "BUCKET-DOESNT-EXIST"
+    mocker.patch.object(mocked_s3[1], "_base_prefix", "BUCKET-DOESNT-EXIST/")
 
     with pytest.raises(transfer.TransferFailed):
         transfer._transfer_single_file("2020-01-01/collection_name.csv.gz", mocked_s3, 1, 1)
 
 
+@pytest.mark.parametrize(
+    "side_effect,attempts,raises",
+    [
+        ([None], 1, False),
+        ([transfer.TransferFailed(), None], 2, False),
+        ([transfer.TransferFailed()] * 3, 3, True),
+    ],
+)
+def test__transfer_single_file_retry(mocker, side_effect, attempts, raises):
+    """Should retry failed attempts with a jittered exponential backoff."""
+    mocker.patch.object(transfer, "_MAX_RETRIES", 3)
+    mocked_attempt = mocker.patch.object(transfer, "_attempt_transfer_single_file", side_effect=side_effect)
+    mocked_sleep = mocker.patch("solgate.transfer.time.sleep")
+
+    if raises:
+        with pytest.raises(transfer.TransferFailed):
+            transfer._transfer_single_file("a/b.csv", [], 1, 1)
+    else:
+        transfer._transfer_single_file("a/b.csv", [], 1, 1)
+
+    assert mocked_attempt.call_count == attempts
+    assert mocked_sleep.call_count == attempts - 1
+    assert all(0 <= c.args[0] <= 2 ** idx for idx, c in enumerate(mocked_sleep.call_args_list))
+
+
 @pytest.mark.parametrize("mocked_s3", ["same_client.yaml"], indirect=["mocked_s3"])
 def test_copy_same_client(mocked_s3, mocker):
     """Should use client.copy when the clients are the same."""
@@ -174,10 +368,34 @@ def test_copy_same_client(mocked_s3, mocker):
     transfer.copy([S3File(client, "a/b.csv") for client in mocked_s3])
 
     [spy.assert_not_called() for spy in spies_open]
-    spies_copy[0].assert_called_once_with("BUCKET", "a/b.csv", "BUCKET", "a/b.csv")
+    spies_copy[0].assert_called_once_with("BUCKET", "a/b.csv", "BUCKET", "a/b.csv", "")
     spies_copy[1].assert_not_called()
 
 
+@pytest.mark.parametrize("mocked_s3", ["same_credentials.yaml"], indirect=["mocked_s3"])
+def test_copy_cross_bucket_same_credentials(mocked_s3, mocker):
+    """Should copy server-side into the destination bucket and root folder."""
+    mocked_s3[0].s3c.put_object(Bucket="BUCKET", Key="a/b.csv", Body="foo")
+    spies_open = [mocker.spy(client, "open") for client in mocked_s3]
+
+    transfer.copy([S3File(mocked_s3[0], "a/b.csv"), S3File(mocked_s3[1], "a-copy/b.csv")])
+
+    [spy.assert_not_called() for spy in spies_open]
+    assert mocked_s3[1].s3c.get_object(Bucket="OTHER-BUCKET", Key="root/a-copy/b.csv")["Body"].read() == b"foo"
+
+
+@pytest.mark.parametrize("mocked_s3", ["different_clients.yaml"], indirect=["mocked_s3"])
+def test_copy_from_source_same_client(mocked_s3, mocker):
+    """Should copy server-side from the source, if the previous destination's flags differ."""
+    mocked_s3[0].s3fs.touch("BUCKET/a/b.csv.gz")
+    spy_copy = mocker.spy(mocked_s3[0], "copy")
+    files = [S3File(mocked_s3[0], "a/b.csv.gz"), S3File(mocked_s3[1], "a/b.csv"), S3File(mocked_s3[0], "c/b.csv.gz")]
+
+    transfer.copy(files)
+
+    spy_copy.assert_called_once_with("BUCKET", "a/b.csv.gz", "BUCKET", "c/b.csv.gz", "")
+
+
 @pytest.mark.parametrize("mocked_s3", ["same_flags.yaml"], indirect=["mocked_s3"])
 def test_copy_same_flags(mocked_s3, mocker):
     """Should open the files with equal settings if the client differs but the flags are the same."""
@@ -190,6 +408,34 @@ def test_copy_same_flags(mocked_s3, mocker):
     spies[1].assert_called_once_with("a/b.csv", "wb")
 
 
+@pytest.mark.parametrize("mocked_s3", ["same_flags.yaml", "different_clients.yaml"], indirect=["mocked_s3"])
+def test_copy_buffer_size(mocked_s3, mocker):
+    """Should stream objects between clients using the configured buffer size."""
+    mocked_s3[0].s3fs.touch("BUCKET/a/b.csv")
+    mocked_copyfileobj = mocker.patch("solgate.transfer.shutil.copyfileobj")
+
+    transfer.copy([S3File(mocked_s3[0], "a/b.csv"), S3File(mocked_s3[1], "a/b.csv")])
+
+    mocked_copyfileobj.assert_called_once_with(mocker.ANY, mocker.ANY, transfer.COPY_BUFFER_SIZE)
+
+
+@pytest.mark.parametrize(
+    "mocked_s3,key,body",
+    [("same_flags.yaml", "a/b.csv", b"foo"), ("different_clients.yaml", "a/b.csv.gz", gzip.compress(b"foo", mtime=0))],
+    indirect=["mocked_s3"],
+)
+def test_copy_multipart(mocked_s3, mocker, key, body):
+    """Should upload objects above the multipart threshold via the managed transfer."""
+    mocked_s3[0].s3c.put_object(Bucket="BUCKET", Key=key, Body=body)
+    mocker.patch.object(transfer, "MULTIPART_THRESHOLD", 0)
+    spy = mocker.spy(mocked_s3[1], "upload_fileobj")
+
+    transfer.copy([S3File(mocked_s3[0], key), S3File(mocked_s3[1], "c/b.csv")])
+
+    spy.assert_called_once_with(mocker.ANY, "c/b.csv")
+    assert mocked_s3[1].s3c.get_object(Bucket="BUCKET", Key="c/b.csv")["Body"].read() == b"foo"
+
+
 @pytest.mark.parametrize("mocked_s3", ["different_clients.yaml"], indirect=["mocked_s3"])
 def test_copy_different_clients(mocked_s3, mocker):
     """Should pass on flags if the client flags differ."""
@@ -1,11 +1,14 @@
 """Test suite for solgate/utils/io.py."""
 import datetime
 import importlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from json import dumps
 from pathlib import Path
 
 import pytest
+import yaml
 
 from solgate.utils import io
 
@@ -24,6 +27,9 @@ from solgate.utils import io
         ("file.csv.gz", "{rest}", "", "file.csv.gz"),
         ("file.csv.gz", "{filename}.{ext}.{comp}", "{filename}", "file"),
         ("2000-01-01/second/file.csv.gz", "{date}/{b}/{rest}", "{b}/{date}/{rest}", "second/2000-01-01/file.csv.gz"),
+        ("2000-01-01/second/file.csv.gz", "{date}/{b}/{rest}", "{date}/{b}/{rest}", "2000-01-01/second/file.csv.gz"),
+        ("2020-01-01/my.table.csv.gz", "{date}/{name}.csv.gz", "{name}/{date}.csv.gz", "my.table/2020-01-01.csv.gz"),
+        ("foo-bar-x/baz", "{a}-x/{b}", "{b}/{a}", "baz/foo-bar"),
     ],
 )
 def test_key_formatter(mocker, key, source_format, destination_format, result):
@@ -54,6 +60,7 @@ def test_key_formatter_with_unpack(args, result):
         ("file.csv.gz", "{this}/{should}/{not}/{parse}", "{parse}"),
         ("file.csv.gz", "{this}.{should}.{not}.{parse}", "{parse}"),
         ("file.csv.gz", "{rest}", "{unknown}/{rest}"),
+        ("file.csv.gz", "{a}/{rest}", "{a}/{rest}"),
     ],
 )
 def test_key_formatter_negative(key, source_format, destination_format):
@@ -62,6 +69,42 @@ def test_key_formatter_negative(key, source_format, destination_format):
         io.key_formatter(key, source_format, destination_format)
 
 
+@pytest.mark.parametrize(
+    "key,source_format,unpack,result",
+    [
+        ("first/second/file.csv.gz", "{a}/{b}/{rest}", False, dict(a="first", b="second", rest="file.csv.gz")),
+        ("first/second/file.csv.gz", "{a}/{rest}", True, dict(a="first", rest="second/file.csv")),
+        ("static.csv.gz", "static.csv.gz", False, dict()),
+    ],
+)
+def test_parse_key(key, source_format, unpack, result):
+    """Should parse source formatter variables out of the key."""
+    assert io.parse_key(key, source_format, unpack) == result
+
+
+@pytest.mark.parametrize(
+    "key,source_format", [("file.csv.gz", "{a}/{rest}"), ("static.csv.gz\n", "static.csv.gz")],
+)
+def test_parse_key_negative(key, source_format):
+    """Should raise when the whole key doesn't match the source formatter."""
+    with pytest.raises(KeyError):
+        io.parse_key(key, source_format)
+
+
+@pytest.mark.parametrize(
+    "attributes,destination_format,result",
+    [
+        (dict(a="first", rest="file.csv"), "{rest}/{a}", "file.csv/first"),
+        (dict(date="parsed"), "{date}", "parsed"),
+        (dict(), "{weekday}", "2"),
+    ],
+)
+def test_format_key(mocker, attributes, destination_format, result):
+    """Should format the key from parsed variables, falling back to time based attributes."""
+    mocker.patch.object(io, "_default_attributes", return_value=dict(date="2020-01-01", weekday="2"))
+    assert io.format_key(attributes, destination_format) == result
+
+
 def test__default_attributes(mocker):
     """Default attributes should be evaluated only once per run and should return Dict[str, str]."""
     mocked_datetime = mocker.patch("solgate.utils.io.datetime", wraps=datetime.datetime)
@@ -73,6 +116,47 @@ def test__default_attributes(mocker):
     )
     assert all(isinstance(v, str) for v in io._default_attributes().values())
     mocked_datetime.now.assert_called_once()
+    with pytest.raises(TypeError):
+        io._default_attributes()["date"] = "shared attributes are read-only"
+
+
+def test__default_attributes_concurrent(mocker):
+    """Concurrent callers should share a single evaluation of the time based attributes."""
+    # pydocstyle: D202
+    def now():
+        time.sleep(0.01)
+        return datetime.datetime.now()
+
+    mocked_datetime = mocker.patch("solgate.utils.io.datetime")
+    mocked_datetime.now.side_effect = now
+    io._default_attributes.cache_clear()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: io._default_attributes(), range(8)))
+
+    mocked_datetime.now.assert_called_once()
+    assert all(r is results[0] for r in results)
+    io._default_attributes.cache_clear()
+
+
+def test__default_attributes_values(mocker):
+    """Should render zero padded time based attributes."""
+    mocked_datetime = mocker.patch("solgate.utils.io.datetime")
+    mocked_datetime.now.return_value = datetime.datetime(2020, 1, 2, 3, 4, 5, 6)
+    io._default_attributes.cache_clear()
+
+    assert dict(io._default_attributes()) == dict(
+        datetime="2020-01-02T03:04:05.000006",
+        date="2020-01-02",
+        year="2020",
+        month="01",
+        day="02",
+        hour="03",
+        minute="04",
+        second="05",
+        weekday="3",
+    )
+    io._default_attributes.cache_clear()
 
 
 @pytest.mark.parametrize(
@@ -88,7 +172,7 @@ def test__default_attributes(mocker):
 )
 def test__get_param_names(formatter, result):
     """Parse out formatter string variables."""
-    assert io._get_param_names(formatter) == set(result)
+    assert io._get_param_names(formatter) == frozenset(result)
 
 
 @pytest.mark.parametrize(
@@ -102,14 +186,30 @@ def test__get_param_names_negative(formatter):
 
 @pytest.mark.parametrize(
     "formatter,regex",
-    [("{a}", "^(?P<a>.*?)"), ("{a}/{b}", "^(?P<a>.*?)/(?P<b>.*?)"), ("{a}.{b}", "^(?P<a>.*?)\\.(?P<b>.*?)")],
+    [
+        ("{a}", "^(?P<a>.*)"),
+        ("{a}/{b}", "^(?P<a>.*?)/(?P<b>.*)"),
+        ("{a}.{b}", "^(?P<a>.*?)\\.(?P<b>.*)"),
+        ("{a}{b}", "^(?P<a>.*?)(?P<b>.*)"),
+        ("{a}-x/{b}.csv", "^(?P<a>.*?)\\-x/(?P<b>.*?)\\.csv"),
+    ],
 )
-def test__create_parser(mocker, formatter, regex):
+def test__create_parser(formatter, regex):
     """Created parser's regex should match the pattern."""
-    mocker.patch.object(io, "_get_param_names").return_value = set()
     assert io._create_parser(formatter).pattern.pattern == regex
 
 
+@pytest.mark.parametrize(
+    "formatter,unpack,regex", [("{a}", False, "^(?P<a>.*)"), ("{a}/{b}", True, "^(?P<a>.*?)/(?P<b>.*)\\..{2,3}")],
+)
+def test__create_key_pattern(formatter, unpack, regex):
+    """Should compile the key pattern once per formatter and unpack flag."""
+    pattern = io._create_key_pattern(formatter, unpack)
+
+    assert pattern.pattern == regex
+    assert io._create_key_pattern(formatter, unpack) is pattern
+
+
 def test__read_yaml_file(fixture_dir):
     """Should parse config file."""
     config = io._read_yaml_file(fixture_dir / "sample_config.yaml")
@@ -118,6 +218,57 @@ def test__read_yaml_file(fixture_dir):
     assert len(config.keys()) == 6
 
 
+def test__read_yaml_file_cached(mocker, tmp_path):
+    """Should parse each file revision only once."""
+    io._read_yaml_file.cache_clear()
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text("key: value\n")
+    spy = mocker.spy(io, "load")
+
+    first = io._read_yaml_file(config_file)
+    assert io._read_yaml_file(config_file) is first
+    assert spy.call_count == 1
+
+    config_file.write_text("key: changed value\n")
+    assert io._read_yaml_file(config_file) == dict(key="changed value")
+    assert spy.call_count == 2
+
+
+def test__read_yaml_file_cache_immutable(fixture_dir):
+    """Should share the parsed config as a read-only structure."""
+    cached = io._read_yaml_file(fixture_dir / "sample_config.yaml")
+
+    with pytest.raises(TypeError):
+        cached["source"]["formatter"] = "{rest}"
+    with pytest.raises(TypeError):
+        cached["destinations"][0] = {}
+
+
+def test__read_yaml_file_cache_eviction(mocker, tmp_path):
+    """Should evict the least recently used file when the cache is full."""
+    io._read_yaml_file.cache_clear()
+    mocker.patch.object(io, "YAML_CACHE_SIZE", 2)
+    files = [tmp_path / f"{i}.yaml" for i in range(3)]
+    for f in files:
+        f.write_text("key: value\n")
+        io._read_yaml_file(f)
+
+    assert list(io._yaml_cache.keys()) == [str(f) for f in files[1:]]
+
+
+@pytest.mark.skipif(not yaml.__with_libyaml__, reason="LibYAML bindings are not available")
+def test_loader_libyaml():
+    """Should parse YAML via LibYAML C bindings when available."""
+    assert io.Loader is yaml.CSafeLoader
+
+
+def test__read_yaml_file_unsafe(mocker):
+    """Should refuse to construct arbitrary Python objects."""
+    mocker.patch("builtins.open", mocker.mock_open(read_data="key: !!python/object/apply:os.getcwd []"))
+    with pytest.raises(yaml.YAMLError):
+        io._read_yaml_file("")
+
+
 def test__read_yaml_file_empty(mocker):
     """Should raise exception when config file is empty."""
     mocked_open = mocker.mock_open()
@@ -211,17 +362,42 @@ def test_read_general_config(fixture_dir):
     assert len(config.items()) == 4
 
 
-def test_deserialize(mocker):
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_deserialize(mocker, use_orjson):
     """Should deserialize from JSON."""
-    mocked_open = mocker.mock_open(read_data='{"a":"b"}')
+    if not use_orjson:
+        mocker.patch.object(io, "orjson", None)
+    elif not io.orjson:
+        pytest.skip("orjson is not available")
+    mocked_open = mocker.mock_open(read_data=b'{"a":"b"}\n{"c": 1}\n')
     mocker.patch("builtins.open", mocked_open)
     files, count = io.deserialize("file.json")
+    assert list(files) == [dict(a="b"), dict(c=1)]
+    assert count == 2
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_deserialize_skip_invalid(mocker, use_orjson):
+    """Should skip lines which can't be decoded only if requested."""
+    if not use_orjson:
+        mocker.patch.object(io, "orjson", None)
+    elif not io.orjson:
+        pytest.skip("orjson is not available")
+    mocked_open = mocker.mock_open(read_data=b'{"a":"b"}\n{"a":"b{"c": 1}\n{"d"')
+    mocker.patch("builtins.open", mocked_open)
+
+    files, count = io.deserialize("file.json", skip_invalid=True)
     assert list(files) == [dict(a="b")]
-    assert count == 1
+    assert count == 3
+
+    files, _ = io.deserialize("file.json")
+    with pytest.raises(ValueError):
+        list(files)
 
 
 def test_serialize(mocker):
     """Should serialize to JSON."""
+    mocker.patch.object(io, "orjson", None)
     mocked_open = mocker.patch("builtins.open")
     io.serialize(dict(a="b"), "file.json")
 
@@ -230,6 +406,25 @@ def test_serialize(mocker):
     args = "".join(c.args[0] for c in calls)
     assert args == '{"a": "b"}\n'
 
+
+@pytest.mark.parametrize(
+    "input,output",
+    [
+        pytest.param(dict(a="b"), b'{"a":"b"}\n', id="dict"),
+        pytest.param(range(2), b"[0,1]\n", id="generator"),
+        pytest.param(datetime.datetime(2020, 1, 1), b'"2020-01-01T00:00:00"\n', id="datetime"),
+    ],
+)
+def test_serialize_orjson(mocker, input, output):
+    """Should serialize to JSON via orjson if available."""
+    pytest.importorskip("orjson")
+    mocked_open = mocker.patch("builtins.open")
+    io.serialize(input, "file.json")
+
+    mocked_open.assert_called_once_with("file.json", "ab")
+    mocked_open.return_value.__enter__.return_value.write.assert_called_once_with(output)
+
+
 def test_ititialize_file(mocker):
     """Should serialize to JSON."""
     mocked_open = mocker.patch("builtins.open")
@@ -246,6 +441,9 @@ def test_ititialize_file(mocker):
     [
         pytest.param(range(2), "[0, 1]", id="generator"),
         pytest.param(datetime.datetime(2020, 1, 1), '"2020-01-01T00:00:00"', id="datetime"),
+        pytest.param(datetime.date(2020, 1, 1), '"2020-01-01"', id="date"),
+        pytest.param(datetime.time(10, 30), '"10:30:00"', id="time"),
+        pytest.param({1}, "[1]", id="set"),
     ],
 )
 def test_custom_encoder(input, output):
@@ -1,7 +1,10 @@
 """Test suite for solgate/utils/s3.py."""
 import random
+import tracemalloc
 from datetime import datetime, timezone
-from gzip import GzipFile
+from gzip import GzipFile, compress
+from io import BytesIO
+from os import urandom
 
 import pytest
 from moto.s3.models import s3_backend
@@ -43,6 +46,12 @@ def test_s3_file_system_from_config_file_order(mocked_s3):
     assert [str(i) for i in mocked_s3] == ["source", "destination.0", "destination.1", "destination.2"]
 
 
+def test_s3_file_system_from_config_file_empty(fixture_dir):
+    """Should not instantiate any client if none are selected."""
+    config = dict(filename="general_section_only.yaml", path=fixture_dir)
+    assert s3.S3FileSystem.from_config_file(config, selector=()) == []
+
+
 @pytest.mark.parametrize(
     "other_fs_params,result",
     [
@@ -75,23 +84,55 @@ def test_s3_file_system_str():
 
 
 @pytest.mark.parametrize(
-    "dest_key,result",
+    "dest_key,dest_path,result",
     [
-        (None, "a/b.csv"),
-        ("", "a/b.csv"),
-        ("c/d.csv", "c/d.csv")
+        (None, None, "a/b.csv"),
+        ("", None, "a/b.csv"),
+        ("c/d.csv", None, "c/d.csv"),
+        ("c/d.csv", "", "c/d.csv"),
+        ("c/d.csv", "root", "root/c/d.csv"),
+        ("c/d.csv", "root/", "root/c/d.csv"),
     ],
 )
 @pytest.mark.parametrize("mocked_s3", ["same_client.yaml"], indirect=["mocked_s3"])
-def test_s3_file_system_copy(dest_key, result, mocked_s3):
+def test_s3_file_system_copy(dest_key, dest_path, result, mocked_s3):
     """Should copy within the same S3fs."""
     fs = mocked_s3[0]
     fs.s3c.put_object(Bucket='BUCKET', Key='a/b.csv', Body='foo')
-    fs.copy("BUCKET", "a/b.csv", "BUCKET", dest_key)
+    fs.copy("BUCKET", "a/b.csv", "BUCKET", dest_key, dest_path)
 
     assert fs.s3c.get_object(Bucket='BUCKET', Key=result)
 
 
+@pytest.mark.parametrize("mocked_s3", ["same_client.yaml"], indirect=["mocked_s3"])
+def test_s3_file_system_delete_objects(mocked_s3, mocker):
+    """Should delete unique keys in batches."""
+    fs = mocked_s3[0]
+    keys = ["a.csv", "b.csv", "c.csv", "keep.csv"]
+    for key in keys:
+        fs.s3c.put_object(Bucket="BUCKET", Key=key, Body="foo")
+    mocker.patch.object(s3, "DELETE_BATCH_SIZE", 2)
+    spy = mocker.spy(fs.s3_client.meta.client, "delete_objects")
+
+    fs.delete_objects(["a.csv", "b.csv", "a.csv", "c.csv"])
+
+    assert spy.call_count == 2
+    assert [o["Key"] for o in fs.s3c.list_objects(Bucket="BUCKET")["Contents"]] == ["keep.csv"]
+
+
+@pytest.mark.parametrize("mocked_s3", ["same_client.yaml"], indirect=["mocked_s3"])
+def test_s3_file_system_delete_objects_errors(mocked_s3, mocker):
+    """Should raise with the failed keys after attempting all batches."""
+    fs = mocked_s3[0]
+    mocker.patch.object(s3, "DELETE_BATCH_SIZE", 1)
+    mocked = mocker.patch.object(fs.s3_client.meta.client, "delete_objects")
+    mocked.side_effect = [dict(Errors=[dict(Key="a.csv", Code="AccessDenied", Message="Access Denied")]), dict()]
+
+    with pytest.raises(IOError, match="a.csv"):
+        fs.delete_objects(["a.csv", "b.csv"])
+    assert mocked.call_count == 2
+
+
 @pytest.mark.parametrize(
     "kwargs,expected_object_count",
     [
@@ -136,6 +177,49 @@ def test_s3_file_system_open(mocked_s3, write_wrapper, kwargs):
         assert f.read() == b"a,b,c\n"
 
 
+@pytest.mark.parametrize(
+    "data,result",
+    [
+        pytest.param(compress(b"a,b,c\n"), b"a,b,c\n", id="Single member"),
+        pytest.param(compress(b"a,b,c\n") + compress(b"d,e,f\n"), b"a,b,c\nd,e,f\n", id="Multiple members"),
+        pytest.param(compress(b""), b"", id="Empty member"),
+        pytest.param(
+            compress(b"a,b,c\n") + bytes(10) + compress(b"d,e,f\n") + bytes(3), b"a,b,c\nd,e,f\n", id="Padding"
+        ),
+        pytest.param(b"", b"", id="Empty file"),
+        pytest.param(compress(urandom(1024 * 1024)), None, id="Larger than chunk"),
+    ],
+)
+def test_gunzip_stream(data, result):
+    """Should decompress gzip streams the same way GzipFile does."""
+    expected = GzipFile(fileobj=BytesIO(data)).read()
+    assert result is None or expected == result
+
+    assert s3._GunzipStream(BytesIO(data)).read() == expected
+
+    stream = s3._GunzipStream(BytesIO(data))
+    assert b"".join(iter(lambda: stream.read(1000), b"")) == expected
+
+
+def test_gunzip_stream_bounded_read():
+    """Should decompress only the requested amount of data on each read."""
+    data = compress(bytes(64 * 1024 * 1024))
+    stream = s3._GunzipStream(BytesIO(data))
+
+    tracemalloc.start()
+    assert stream.read(1024) == bytes(1024)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert peak < 1024 * 1024
+
+
+def test_gunzip_stream_truncated():
+    """Should fail on incomplete gzip member."""
+    with pytest.raises(EOFError):
+        s3._GunzipStream(BytesIO(compress(b"a,b,c\n")[:-4])).read()
+
+
 @pytest.mark.parametrize("mocked_s3", ["same_client.yaml"], indirect=["mocked_s3"])
 def test_s3_file_system_open_write(mocked_s3):
     """Should allow opening in write mode."""
@@ -166,6 +250,18 @@ def test_s3_file_system_info(mocked_s3):
         fs.info("BUCKET/file.csv")
 
 
+@pytest.mark.parametrize("mocked_s3", ["same_client.yaml"], indirect=["mocked_s3"])
+def test_s3_file_system_exists(mocked_s3):
+    """Should check object presence without populating the listing cache."""
+    fs = mocked_s3[0]
+    assert not fs.exists("file.csv")
+
+    fs.s3c.put_object(Bucket="BUCKET", Key="file.csv", Body="foo")
+
+    assert fs.exists("file.csv")
+    assert fs.info("file.csv")["size"] == 3
+
+
 @pytest.mark.parametrize("mocked_s3", ["same_client.yaml"], indirect=["mocked_s3"])
 def test_s3_file_system_rm(mocked_s3):
     """Should unlink file."""